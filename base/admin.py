@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Room, Message, Comment, Event, Poll, Choice, Notification, AdminNotification
+from .models import Room, Message, Comment, Event, Rsvp, Poll, Choice, Vote, Notification, AdminNotification, Inbox, InboxItem, NotificationEvent
 # Register your models here.
 
 
@@ -8,6 +8,11 @@ admin.site.register(Message)
 admin.site.register(Comment)
 admin.site.register(Poll)
 admin.site.register(Event)
+admin.site.register(Rsvp)
 admin.site.register(Choice)
+admin.site.register(Vote)
 admin.site.register(Notification)
 admin.site.register(AdminNotification)
+admin.site.register(Inbox)
+admin.site.register(InboxItem)
+admin.site.register(NotificationEvent)
@@ -0,0 +1,144 @@
+"""Move old messages out of the hot tables.
+
+Each archived message becomes one ``ArchivedMessage`` row. Its comments,
+likes and notifications are packed into that row's compressed payload, and
+the live rows are deleted. Room pages, feeds and their indexes then only
+ever see recent history. The archive is read back a page at a time by the
+room's history view.
+"""
+import datetime
+import json
+import zlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Room, Message, Comment, ArchivedMessage, Notification, AdminNotification, InboxItem
+from .notifications import recount_many
+from .pagination import KeysetPage, keyset_page
+
+
+HISTORY_PER_PAGE = 20
+HISTORY_ORDERING = ['-created', '-id']
+NOTIFICATION_FIELDS = ['action_type', 'action_by_id', 'action_to_id', 'actor_count', 'read_status']
+
+
+def pack(data: dict) -> bytes:
+    raw = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return zlib.compress(raw, settings.ARCHIVE_COMPRESSION_LEVEL)
+
+
+def unpack(payload) -> dict:
+    data = json.loads(zlib.decompress(bytes(payload)))
+    for comment in data['comments']:
+        comment['created'] = parse_datetime(comment['created'])
+    return data
+
+
+def cutoff(room: Room, now=None) -> datetime.datetime:
+    """Messages created before this moment are due for the archive."""
+    days = room.retention_days if room.retention_days is not None else settings.MESSAGE_RETENTION_DAYS
+    return (now or timezone.now()) - datetime.timedelta(days=days)
+
+
+def archive_room(room: Room, before: datetime.datetime | None = None,
+                 batch_size: int | None = None) -> int:
+    """Archive the room's messages older than ``before``, oldest first; return how many.
+
+    Every batch is its own transaction, so a large backlog never holds the
+    write lock for long and an interrupted run loses nothing.
+    """
+    before = before or cutoff(room)
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    archived = 0
+    while True:
+        ids = list(room.message_set.filter(created__lt=before).order_by('created', 'id').values_list(
+            'id', flat=True
+        )[:batch_size])
+        if not ids:
+            return archived
+        archived += archive_messages(ids)
+
+
+def archive_messages(message_ids: list) -> int:
+    """Pack the given messages and everything hanging off them, then delete the live rows."""
+    with transaction.atomic():
+        messages = list(Message.objects.filter(id__in=message_ids).select_for_update())
+        if not messages:
+            return 0
+        ids = [message.id for message in messages]
+
+        likes, comments, notifications = {}, {}, {}
+        for message_id, user_id in Message.likes.through.objects.filter(
+            message_id__in=ids
+        ).order_by('id').values_list('message_id', 'user_id'):
+            likes.setdefault(message_id, []).append(user_id)
+        for comment in Comment.objects.filter(message_id__in=ids).order_by('created', 'id').values(
+            'message_id', 'author_id', 'body', 'created', 'hidden_status'
+        ):
+            comments.setdefault(comment.pop('message_id'), []).append(comment)
+        for key, model in (('notifications', Notification), ('admin_notifications', AdminNotification)):
+            for row in model.objects.filter(message_id__in=ids).values('message_id', *NOTIFICATION_FIELDS):
+                notifications.setdefault((key, row.pop('message_id')), []).append(row)
+
+        ArchivedMessage.objects.bulk_create([
+            ArchivedMessage(
+                id=message.id,
+                room_id=message.room_id,
+                author_id=message.author_id,
+                created=message.created,
+                hidden_status=message.hidden_status,
+                payload=pack({
+                    'title': message.title,
+                    'body': message.body,
+                    'updated': message.updated,
+                    'likes': likes.get(message.id, []),
+                    'comments': comments.get(message.id, []),
+                    'notifications': notifications.get(('notifications', message.id), []),
+                    'admin_notifications': notifications.get(('admin_notifications', message.id), []),
+                })
+            )
+            for message in messages
+        ])
+
+        unread = set(InboxItem.objects.filter(read_status=False).filter(
+            Q(notification__message_id__in=ids) | Q(admin_notification__message_id__in=ids)
+        ).values_list('user_id', flat=True))
+
+        # Raw deletes skip the per-row Comment signals; the counters they keep
+        # belong to the messages being removed.
+        InboxItem.objects.filter(
+            Q(notification__message_id__in=ids) | Q(admin_notification__message_id__in=ids)
+        )._raw_delete(InboxItem.objects.db)
+        for model in (Notification, AdminNotification, Comment):
+            model.objects.filter(message_id__in=ids)._raw_delete(model.objects.db)
+        Message.likes.through.objects.filter(message_id__in=ids)._raw_delete(Message.objects.db)
+        Message.objects.filter(id__in=ids).delete()
+
+        recount_many(unread)
+    return len(messages)
+
+
+def history_page(room: Room, cursor: str | None = None, include_hidden: bool = False) -> KeysetPage:
+    """Return a page of the room's archived messages, newest first, with payloads unpacked.
+
+    Comment authors for the whole page are fetched with one query.
+    """
+    archived = room.archived_messages.select_related('author')
+    if not include_hidden:
+        archived = archived.filter(hidden_status=False)
+    page = keyset_page(archived, HISTORY_ORDERING, cursor, HISTORY_PER_PAGE)
+    for message in page.items:
+        message.content = unpack(message.payload)
+    authors = User.objects.in_bulk({
+        comment['author_id'] for message in page.items for comment in message.content['comments']
+    })
+    for message in page.items:
+        for comment in message.content['comments']:
+            comment['author'] = authors.get(comment['author_id'])
+    return page
@@ -0,0 +1,30 @@
+"""Shared helpers for the benchmark management commands."""
+import subprocess
+from statistics import fmean
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summarize(seconds):
+    """Latency percentiles in milliseconds for a list of durations in seconds."""
+    return {
+        'p50_ms': percentile(seconds, 0.5) * 1000,
+        'p90_ms': percentile(seconds, 0.9) * 1000,
+        'p99_ms': percentile(seconds, 0.99) * 1000,
+        'mean_ms': fmean(seconds) * 1000 if seconds else 0.0,
+        'max_ms': max(seconds, default=0.0) * 1000,
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
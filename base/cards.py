@@ -0,0 +1,28 @@
+"""Cached card fragments.
+
+Card templates cache their markup under the object's id and version (its
+``updated`` time, plus any counter shown on the card that changes through
+``F()`` updates). Saving therefore moves a card to a new key; deleting an
+object drops its card here. The names and ``vary_on`` values must match the
+``{% cache %}`` tags in the card templates.
+"""
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+
+CARD_CACHE = 'fragments'
+
+CARD_VERSIONS = {
+    'room_card': lambda room: [room.id, room.updated],
+    'message_card': lambda message: [message.id, message.updated, message.like_count, message.comment_count],
+    'event_card': lambda event: [event.id, event.updated, event.accepted_count],
+    'poll_card': lambda poll: [poll.id, poll.updated],
+}
+
+
+def card_key(name, instance):
+    return make_template_fragment_key(name, CARD_VERSIONS[name](instance))
+
+
+def forget_card(name, instance):
+    caches[CARD_CACHE].delete(card_key(name, instance))
@@ -0,0 +1,19 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import get_inbox
+
+
+def inbox(request):
+    """Expose the user's unread counters; only queried if a template reads them."""
+    def load():
+        if request.user.is_authenticated:
+            return get_inbox(request.user)
+        return None
+
+    return {'inbox': SimpleLazyObject(load)}
+
+
+def live_updates(request):
+    """Server-sent event streams are only offered when the page is served over ASGI."""
+    return {'live_updates': isinstance(request, ASGIRequest)}
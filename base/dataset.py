@@ -0,0 +1,320 @@
+"""Synthetic data for benchmarks and capacity planning.
+
+Rows whose ids are needed later go in with ``bulk_create``; link tables and
+other narrow, high-volume tables skip model instances and go straight to
+``executemany``. Messages and everything hanging off them are generated a
+chunk at a time, so memory stays flat however many rows are asked for. Every random choice comes
+from one seeded generator: the same arguments give the same dataset.
+"""
+import bisect
+import datetime
+import itertools
+import random
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connection, connections, reset_queries, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import page_cache, roles, search
+from .models import (
+    Room, Message, Comment, Poll, Choice, Vote, Event, Rsvp, Notification, AdminNotification, Inbox, InboxItem
+)
+from .notifications import recount_many
+
+
+# Pareto shapes of the per-message like and comment counts: most messages
+# get none, a few get hundreds.
+LIKE_SHAPE = 1.3
+COMMENT_SHAPE = 2.0
+MAX_LIKES = 500
+MAX_COMMENTS = 100
+MAX_VOTERS = 1000
+HIDDEN_SHARE = 0.01
+GIANT_ROOM_ADMINS = 3
+
+
+def generate(users=1000, rooms=100, messages=10000, seed=0, batch_size=5000, *,
+             giant_rooms=3, giant_share=0.5, skew=1.0, polls=None, events=None,
+             days=365, unread_days=7, progress=None):
+    """Add a reproducible dataset of the given size and return the row counts added.
+
+    ``giant_rooms`` rooms share ``giant_share`` of the messages and have
+    every user as a member; the rest split the remainder by a Zipf law with
+    exponent ``skew`` (0 is uniform). Activity is spread over the last
+    ``days`` days and notifications newer than ``unread_days`` stay unread.
+    ``polls`` and ``events`` default to two per room. ``progress`` is called
+    with the running counts after each chunk.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    first = now - datetime.timedelta(days=days)
+    unread_after = now - datetime.timedelta(days=unread_days)
+    counts = Counter()
+    report = progress or (lambda counts: None)
+
+    weights = room_weights(rooms, giant_rooms, giant_share, skew)
+
+    with explicit_timestamps(Room, Message, Poll, Event):
+        with transaction.atomic():
+            start = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+            user_ids = [user.id for user in User.objects.bulk_create(
+                (User(username=f'bench{start + i}', password='!', date_joined=first) for i in range(users)),
+                batch_size=batch_size
+            )]
+            counts['users'] = len(user_ids)
+
+            top = weights[0] if weights else 1
+            members = [
+                rng.sample(user_ids, max(2, min(len(user_ids), round(len(user_ids) * weight / top))))
+                for weight in weights
+            ]
+            room_ids = [room.id for room in Room.objects.bulk_create(
+                (Room(title=f'Room {i}', description=f'Benchmark room {i}', host_id=ids[0],
+                      open_status=i < giant_rooms or rng.random() < 0.8, created=first, updated=first)
+                 for i, ids in enumerate(members)),
+                batch_size=batch_size
+            )]
+            counts['rooms'] = len(room_ids)
+            members = dict(zip(room_ids, members))
+            admins = {
+                room_id: ids[:GIANT_ROOM_ADMINS if rank < giant_rooms else 1]
+                for rank, (room_id, ids) in enumerate(members.items())
+            }
+            counts['memberships'] = insert_rows(
+                Room.members.through, ['room', 'user'],
+                ((room_id, user_id) for room_id, ids in members.items() for user_id in ids), batch_size
+            )
+            counts['admins'] = insert_rows(
+                Room.admins.through, ['room', 'user'],
+                ((room_id, user_id) for room_id, ids in admins.items() for user_id in ids), batch_size
+            )
+        report(counts)
+
+        cumulative = list(itertools.accumulate(weights))
+        last_posts = {}
+        step = (now - first) / max(messages, 1)
+        for offset in range(0, messages, batch_size):
+            size = min(batch_size, messages - offset)
+            with transaction.atomic():
+                add_messages(
+                    rng, counts, batch_size, members, admins, unread_after, last_posts,
+                    [
+                        (room_ids[bisect.bisect_left(cumulative, rng.random() * cumulative[-1])],
+                         first + step * (offset + i + rng.random()))
+                        for i in range(size)
+                    ]
+                )
+            # DEBUG keeps every statement otherwise.
+            reset_queries()
+            report(counts)
+
+        with transaction.atomic():
+            Room.objects.bulk_update(
+                [Room(id=room_id, updated=updated) for room_id, updated in last_posts.items()],
+                ['updated'], batch_size=batch_size
+            )
+            add_polls(rng, counts, batch_size, members, cumulative, first, now, rooms * 2 if polls is None else polls)
+            add_events(rng, counts, batch_size, members, cumulative, first, now, rooms * 2 if events is None else events)
+        report(counts)
+
+    with transaction.atomic():
+        Inbox.objects.bulk_create([Inbox(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        for offset in range(0, len(user_ids), batch_size):
+            recount_many(user_ids[offset:offset + batch_size])
+
+    # bulk_create skips the signals that keep these in step.
+    search.rebuild_index()
+    roles.clear()
+    page_cache.invalidate('home')
+    return dict(counts)
+
+
+def add_messages(rng, counts, batch_size, members, admins, unread_after, last_posts, posts):
+    """Insert one chunk of (room_id, created) messages with their likes, comments and notifications."""
+    likers = []
+    commenters = []
+    rows = []
+    for room_id, created in posts:
+        people = members[room_id]
+        liked_by = rng.sample(people, min(len(people), MAX_LIKES, int(rng.paretovariate(LIKE_SHAPE)) - 1))
+        likers.append(liked_by)
+        commenters.append([
+            rng.choice(people) for _ in range(min(MAX_COMMENTS, int(rng.paretovariate(COMMENT_SHAPE)) - 1))
+        ])
+        rows.append(Message(
+            room_id=room_id, author_id=rng.choice(people), body=f'Message {counts["messages"] + len(rows)}',
+            created=created, updated=created, hidden_status=rng.random() < HIDDEN_SHARE,
+            like_count=len(liked_by), comment_count=len(commenters[-1])
+        ))
+        last_posts[room_id] = created
+    posted = Message.objects.bulk_create(rows, batch_size=batch_size)
+    counts['messages'] += len(posted)
+
+    counts['likes'] += insert_rows(
+        Message.likes.through, ['message', 'user'],
+        ((message.id, user_id) for message, liked_by in zip(posted, likers) for user_id in liked_by), batch_size
+    )
+    counts['comments'] += insert_rows(
+        Comment, ['message', 'author', 'body', 'created', 'hidden_status'],
+        ((message.id, user_id, 'Comment', message.created + datetime.timedelta(seconds=30 * (i + 1)), False)
+         for message, written_by in zip(posted, commenters) for i, user_id in enumerate(written_by)),
+        batch_size
+    )
+
+    # One aggregate per message and action, as the dispatcher leaves them.
+    actions = [
+        (message, action_type, actors)
+        for message, liked_by, written_by in zip(posted, likers, commenters)
+        for action_type, actors in (('l', liked_by), ('c', written_by))
+        if actors
+    ]
+    for model, kind, field, label in ((Notification, 'n', 'notification', 'notifications'),
+                                      (AdminNotification, 'a', 'admin_notification', 'admin_notifications')):
+        notifications = model.objects.bulk_create(
+            (model(action_by_id=actors[-1], action_to_id=message.author_id, room_id=message.room_id,
+                   message_id=message.id, action_type=action_type, actor_count=len(set(actors)),
+                   actors=list(dict.fromkeys(reversed(actors)))[::-1],
+                   read_status=message.created < unread_after)
+             for message, action_type, actors in actions),
+            batch_size=batch_size
+        )
+        counts[label] += len(notifications)
+        counts['inbox_items'] += insert_rows(
+            InboxItem, ['user', 'kind', field, 'read_status', 'created'],
+            ((user_id, kind, notification.id, notification.read_status, message.created)
+             for notification, (message, _, _) in zip(notifications, actions)
+             for user_id in (admins[message.room_id] if kind == 'a' else [message.author_id])),
+            batch_size
+        )
+
+
+def add_polls(rng, counts, batch_size, members, cumulative, first, now, total):
+    room_ids = list(members)
+    created = Poll.objects.bulk_create(
+        (poll_or_event(Poll, rng, room_ids, members, cumulative, first, now, question=f'Poll {i}')
+         for i in range(total)),
+        batch_size=batch_size
+    )
+    counts['polls'] += len(created)
+
+    choices = []
+    ballots = []
+    for poll in created:
+        options = [Choice(poll_id=poll.id, text=f'Choice {i}') for i in range(rng.randint(2, 5))]
+        popularity = [rng.random() for _ in options]
+        people = members[poll.room_id] if poll.starts_at < now else []
+        for user_id in rng.sample(people, min(MAX_VOTERS, int(len(people) * rng.uniform(0, 0.1)))):
+            choice = rng.choices(options, popularity)[0]
+            choice.votes += 1
+            ballots.append((poll, choice, user_id))
+        choices.extend(options)
+    counts['choices'] += len(Choice.objects.bulk_create(choices, batch_size=batch_size))
+    counts['votes'] += insert_rows(
+        Vote, ['poll', 'choice', 'user', 'created'],
+        ((poll.id, choice.id, user_id, between(rng, poll.starts_at, min(poll.expires_at, now)))
+         for poll, choice, user_id in ballots),
+        batch_size
+    )
+
+
+def add_events(rng, counts, batch_size, members, cumulative, first, now, total):
+    room_ids = list(members)
+    rows = []
+    answers = []
+    for i in range(total):
+        event = poll_or_event(Event, rng, room_ids, members, cumulative, first, now, title=f'Event {i}')
+        people = members[event.room_id]
+        responses = [
+            (user_id, 'a' if rng.random() < 0.7 else 'r')
+            for user_id in rng.sample(people, min(MAX_VOTERS, int(len(people) * rng.uniform(0, 0.05))))
+        ]
+        event.accepted_count = sum(status == 'a' for _, status in responses)
+        event.rejected_count = len(responses) - event.accepted_count
+        rows.append(event)
+        answers.append(responses)
+    created = Event.objects.bulk_create(rows, batch_size=batch_size)
+    counts['events'] += len(created)
+    counts['rsvps'] += insert_rows(
+        Rsvp, ['event', 'user', 'status', 'created'],
+        ((event.id, user_id, status,
+          between(rng, event.starts_at - datetime.timedelta(days=7), min(event.starts_at, now)))
+         for event, responses in zip(created, answers) for user_id, status in responses),
+        batch_size
+    )
+
+
+def poll_or_event(model, rng, room_ids, members, cumulative, first, now, **fields):
+    """Build an unsaved poll or event in a weighted room, some past, some running, some ahead."""
+    room_id = room_ids[bisect.bisect_left(cumulative, rng.random() * cumulative[-1])]
+    starts_at = first + (now - first + datetime.timedelta(days=14)) * rng.random()
+    return model(
+        room_id=room_id, created_by_id=members[room_id][0], starts_at=starts_at,
+        expires_at=starts_at + datetime.timedelta(hours=rng.randint(1, 14 * 24)),
+        updated=min(starts_at, now), **fields
+    )
+
+
+def between(rng, start, end):
+    return start + (end - start) * rng.random()
+
+
+def room_weights(rooms, giant_rooms, giant_share, skew):
+    """Share of the messages each room gets: a few giant rooms, then a Zipf tail."""
+    giants = min(giant_rooms, rooms)
+    tail = [1 / (rank + 1) ** skew for rank in range(rooms - giants)]
+    if not giants:
+        giant_share = 0
+    elif not tail:
+        giant_share = 1
+    total = sum(tail) or 1
+    return [giant_share / giants] * giants + [(1 - giant_share) * weight / total for weight in tail]
+
+
+def insert_rows(model, field_names, rows, batch_size):
+    """Insert tuples of field values into ``model``'s table with ``executemany``.
+
+    No instances, defaults or signals: every column without a database
+    default has to be listed. Returns the number of rows inserted.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields))
+    )
+    # Ids, flags and text pass through as they are; only e.g. datetimes need adapting.
+    database = connections[DEFAULT_DB_ALIAS]
+    rows = iter(rows)
+    inserted = 0
+    with database.cursor() as cursor:
+        while batch := list(itertools.islice(rows, batch_size)):
+            cursor.executemany(sql, [
+                [value if isinstance(value, (int, str)) else field.get_db_prep_save(value, database)
+                 for field, value in zip(fields, row)]
+                for row in batch
+            ])
+            inserted += len(batch)
+    return inserted
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let ``bulk_create`` keep the ``auto_now``/``auto_now_add`` values set on the rows.
+
+    Meant for single-threaded loaders only: the flags live on the model fields.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
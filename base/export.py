@@ -0,0 +1,159 @@
+"""Room history as JSON Lines, produced incrementally.
+
+Rows are read with chunked ``iterator()`` queries in id order. Their
+children (likes, comments, choices, RSVPs) come from one more chunked query
+per batch of parents, ordered the same way and merged in as they stream
+past. Only one parent's children are held at a time, so memory use does
+not grow with the size of the room.
+"""
+import itertools
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .archive import unpack
+from .models import Room, Message, Comment, Choice, Rsvp
+
+
+def batches(queryset, size):
+    rows = queryset.iterator(chunk_size=size)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+def children(parents, queryset, parent_field, *fields):
+    """Pair each parent with the ``fields`` of its rows in ``queryset``.
+
+    ``parents`` must be in id order; the children are read in the same order
+    with a single chunked query and merged in.
+    """
+    rows = queryset.filter(**{f'{parent_field}__in': [parent.id for parent in parents]}).order_by(
+        parent_field, 'id'
+    ).values_list(parent_field, *fields).iterator(chunk_size=settings.EXPORT_BATCH_SIZE)
+    groups = itertools.groupby(rows, key=lambda row: row[0])
+    group = next(groups, None)
+    for parent in parents:
+        if group is not None and group[0] == parent.id:
+            yield parent, [row[1:] for row in group[1]]
+            group = next(groups, None)
+        else:
+            yield parent, []
+
+
+def records(room: Room, batch_size: int | None = None):
+    """Yield the room, then its archived and live messages, polls and events, each by id."""
+    size = batch_size or settings.EXPORT_BATCH_SIZE
+    yield {
+        'type': 'room',
+        'id': room.id,
+        'title': room.title,
+        'description': room.description,
+        'host': room.host.username if room.host else None,
+        'created': room.created,
+    }
+
+    for batch in batches(room.archived_messages.select_related('author').order_by('id'), size):
+        contents = [unpack(message.payload) for message in batch]
+        usernames = dict(User.objects.filter(id__in={
+            user_id for content in contents
+            for user_id in content['likes'] + [comment['author_id'] for comment in content['comments']]
+        }).values_list('id', 'username'))
+        for message, content in zip(batch, contents):
+            yield {
+                'type': 'message',
+                'id': message.id,
+                'author': message.author.username,
+                'title': content['title'],
+                'body': content['body'],
+                'created': message.created,
+                'hidden': message.hidden_status,
+                'archived': True,
+                'likes': [usernames.get(user_id) for user_id in content['likes']],
+                'comments': [
+                    {'author': usernames.get(comment['author_id']), 'body': comment['body'],
+                     'created': comment['created'], 'hidden': comment['hidden_status']}
+                    for comment in content['comments']
+                ],
+            }
+
+    for batch in batches(room.message_set.select_related('author').order_by('id'), size):
+        for (message, likes), (_, comments) in zip(
+            children(batch, Message.likes.through.objects, 'message_id', 'user__username'),
+            children(batch, Comment.objects, 'message_id', 'author__username', 'body', 'created', 'hidden_status'),
+        ):
+            yield {
+                'type': 'message',
+                'id': message.id,
+                'author': message.author.username,
+                'title': message.title,
+                'body': message.body,
+                'created': message.created,
+                'hidden': message.hidden_status,
+                'archived': False,
+                'likes': [username for username, in likes],
+                'comments': [
+                    {'author': author, 'body': body, 'created': created, 'hidden': hidden}
+                    for author, body, created, hidden in comments
+                ],
+            }
+
+    for batch in batches(room.poll_set.select_related('created_by').order_by('id'), size):
+        for poll, choices in children(batch, Choice.objects, 'poll_id', 'text', 'votes'):
+            yield {
+                'type': 'poll',
+                'id': poll.id,
+                'question': poll.question,
+                'created_by': poll.created_by.username,
+                'starts_at': poll.starts_at,
+                'expires_at': poll.expires_at,
+                'choices': [{'text': text, 'votes': votes} for text, votes in choices],
+            }
+
+    for batch in batches(room.event_set.select_related('created_by').order_by('id'), size):
+        for event, answers in children(batch, Rsvp.objects, 'event_id', 'user__username', 'status'):
+            yield {
+                'type': 'event',
+                'id': event.id,
+                'title': event.title,
+                'description': event.description,
+                'created_by': event.created_by.username,
+                'starts_at': event.starts_at,
+                'expires_at': event.expires_at,
+                'accepted': [username for username, status in answers if status == 'a'],
+                'rejected': [username for username, status in answers if status == 'r'],
+            }
+
+
+def stream(room: Room, compress: bool = False, batch_size: int | None = None):
+    """Yield the export as bytes, roughly ``EXPORT_CHUNK_SIZE`` at a time, gzipped if asked."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer, size = [], 0
+    for record in records(room, batch_size):
+        data = (json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n').encode()
+        if compressor:
+            data = compressor.compress(data)
+        buffer.append(data)
+        size += len(data)
+        if size >= settings.EXPORT_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if compressor:
+        buffer.append(compressor.flush())
+    if buffer:
+        yield b''.join(buffer)
+
+
+async def asynchronous(chunks):
+    """Serve a synchronous stream from ASGI one chunk at a time.
+
+    Django would otherwise read a synchronous iterator into a list before
+    sending any of it.
+    """
+    chunks = iter(chunks)
+    step = sync_to_async(next)
+    while (chunk := await step(chunks, None)) is not None:
+        yield chunk
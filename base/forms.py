@@ -25,7 +25,7 @@ class MessageForm(ModelForm):
     class Meta:
         model = Message
         fields = '__all__'
-        exclude = ['likes', 'author', 'room', 'hidden_status']
+        exclude = ['likes', 'author', 'room', 'hidden_status', 'like_count', 'comment_count']
 
 class CommentForm(ModelForm):
     class Meta:
@@ -48,7 +48,7 @@ class PollForm(ModelForm):
 class EventForm(ModelForm):
     class Meta:
         model = Event
-        exclude = ['created_by', 'room', 'accepted', 'rejected']
+        exclude = ['created_by', 'room', 'accepted_count', 'rejected_count']
         widgets = {
             'starts_at': DateTimeInput(attrs={
                 'type': 'datetime-local'
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from base.archive import archive_room
+from base.models import Room
+
+
+class Command(BaseCommand):
+    help = "Move messages older than their room's retention window into the archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ARCHIVE_BATCH_SIZE,
+            help='Number of messages archived per transaction.'
+        )
+        parser.add_argument(
+            '--room',
+            type=int,
+            action='append',
+            dest='rooms',
+            help='Only archive this room; may be repeated.'
+        )
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.order_by('id')
+        if options['rooms']:
+            rooms = rooms.filter(id__in=options['rooms'])
+
+        total = 0
+        for room in rooms.iterator():
+            archived = archive_room(room, batch_size=options['batch_size'])
+            if archived and options['verbosity'] > 1:
+                self.stdout.write(f'{room}: {archived}')
+            total += archived
+        self.stdout.write(f'Archived {total} messages')
@@ -0,0 +1,133 @@
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from base.benchmark import percentile
+
+
+SAMPLE_SIZE = 1000
+
+
+def setup(path, profile):
+    """Start Django in a fresh process against ``path`` with ``profile``'s PRAGMAs and options."""
+    import django
+    django.setup()
+    settings.SQLITE_PRAGMAS = settings.SQLITE_PROFILES[profile]
+    settings.DATABASES['default'].update(NAME=path, OPTIONS=settings.SQLITE_OPTIONS[profile])
+    # Inline dispatch reads the unread aggregates and then writes them in one
+    # transaction, the pattern that needs IMMEDIATE transactions.
+    settings.NOTIFICATION_DISPATCH = 'inline'
+
+
+def load(path, profile, users, rooms, messages):
+    """Create the schema and a seeded dataset in ``path``."""
+    setup(path, profile)
+    from django.core.management import call_command
+    from base import dataset
+    call_command('migrate', verbosity=0)
+    dataset.generate(users=users, rooms=rooms, messages=messages, seed=0, polls=0, events=0)
+
+
+def worker(path, profile, duration, write_ratio, seed):
+    """Mix room feed reads with likes and their notifications until ``duration`` runs out, like one app worker."""
+    setup(path, profile)
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection
+    from base import notifications
+    from base.models import Message, Room
+    from base.room_page import message_feed
+
+    rng = random.Random(seed)
+    user_ids = list(User.objects.values_list('id', flat=True)[:SAMPLE_SIZE])
+    sample = list(Message.objects.order_by('?').values_list('id', 'room_id', 'author_id')[:SAMPLE_SIZE])
+    reads = writes = locked = 0
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        message_id, room_id, author_id = rng.choice(sample)
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                message = Message(id=message_id, room_id=room_id, author_id=author_id)
+                user = User(id=rng.choice(user_ids))
+                notify = notifications.save_notification if message.toggle_like(user) else notifications.retract_notification
+                notify(room=Room(id=room_id), action_by=user, message=message,
+                       action_to=User(id=author_id), action_type='l')
+                writes += 1
+            else:
+                list(message_feed(Room(id=room_id)))
+                reads += 1
+        except OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    return reads, writes, locked, latencies
+
+
+class Command(BaseCommand):
+    help = 'Compare the app\'s SQLite throughput under concurrent worker processes for each database profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles', help='Profile to run; may be repeated.')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds each profile runs.')
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--rows', type=int, default=50000, help='Messages loaded before the run.')
+        parser.add_argument('--json', action='store_true', help='Print one JSON object per profile.')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'] or list(settings.SQLITE_PROFILES)
+        unknown = set(profiles) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f'Unknown profile: {", ".join(sorted(unknown))}')
+
+        results = [self.run(profile, options) for profile in profiles]
+        for result in results:
+            if options['json']:
+                self.stdout.write(json.dumps(result))
+            else:
+                self.stdout.write(
+                    '{profile:>12}: {ops_per_second:>9.0f} ops/s  reads {reads}  writes {writes}  '
+                    'locked {locked}  p50 {p50_ms:.2f}ms  p99 {p99_ms:.2f}ms'.format(**result)
+                )
+
+    def run(self, profile, options):
+        # Workers are spawned, so each one starts Django with this database
+        # and profile instead of inheriting the command's connection.
+        context = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            with context.Pool(1) as pool:
+                pool.apply(load, (path, profile, options['users'], options['rooms'], options['rows']))
+            arguments = [
+                (path, profile, options['duration'], options['write_ratio'], seed)
+                for seed in range(options['workers'])
+            ]
+            with context.Pool(options['workers']) as pool:
+                outcomes = pool.starmap(worker, arguments)
+
+        reads = sum(outcome[0] for outcome in outcomes)
+        writes = sum(outcome[1] for outcome in outcomes)
+        latencies = [latency for outcome in outcomes for latency in outcome[3]]
+        return {
+            'profile': profile,
+            'workers': options['workers'],
+            'duration': options['duration'],
+            'reads': reads,
+            'writes': writes,
+            'locked': sum(outcome[2] for outcome in outcomes),
+            'ops_per_second': (reads + writes) / options['duration'],
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        }
@@ -0,0 +1,135 @@
+import json
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from base import dataset
+from base.benchmark import current_commit, summarize
+from base.models import Room, Message, Comment, Poll, Event, Notification, AdminNotification
+
+
+COUNTED_MODELS = [User, Room, Message, Comment, Poll, Event, Notification, AdminNotification]
+
+
+class Command(BaseCommand):
+    help = 'Measure latency percentiles and query counts of the main views and actions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario.')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+        parser.add_argument('--compare', help='Print changes against an earlier JSON report.')
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request.')
+        parser.add_argument('--generate', action='store_true', help='Add a synthetic dataset before measuring.')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--messages', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            dataset.generate(options['users'], options['rooms'], options['messages'], seed=options['seed'])
+
+        client = Client(HTTP_HOST=options['host'])
+        results = [
+            self.measure(client, *scenario, options['iterations'], options['warmup'])
+            for scenario in self.scenarios(client)
+        ]
+        report = {
+            'commit': current_commit(),
+            'created': timezone.now().isoformat(),
+            'database': {'vendor': connection.vendor, 'profile': settings.DATABASE_PROFILE},
+            'dataset': {model._meta.label: model.objects.count() for model in COUNTED_MODELS},
+            'iterations': options['iterations'],
+            'results': results,
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report)
+
+    def scenarios(self, client):
+        """Yield (name, method, url, data, mutates) for the busiest room in the database."""
+        busiest = Message.objects.values('room').annotate(total=Count('id')).order_by('-total').first()
+        if busiest is None:
+            raise CommandError('No messages to benchmark; run with --generate or load a dataset.')
+        room = Room.objects.get(id=busiest['room'])
+        user = room.host
+        message = room.message_set.filter(hidden_status=False).order_by('-created', '-id').first()
+        now = timezone.now()
+        poll = room.poll_set.filter(starts_at__lte=now, expires_at__gt=now).exclude(voted_users=user).first()
+        event = room.event_set.filter(expires_at__gt=now).exclude(rsvps__user=user).first()
+        other_room = Room.objects.filter(open_status=True).exclude(members=user).first()
+
+        yield 'home_anonymous', 'get', reverse('home'), None, False
+        client.force_login(user)
+        yield 'home', 'get', reverse('home'), None, False
+        yield 'room', 'get', reverse('room', args=[room.id]), None, False
+        yield 'room_messages', 'get', reverse('room-messages', args=[room.id]), None, False
+        yield 'timeline', 'get', reverse('timeline'), None, False
+        yield 'message', 'get', reverse('message', args=[message.id]), None, False
+        yield 'like', 'post', reverse('message', args=[message.id]), {'like_submit': ''}, True
+        yield 'comment', 'post', reverse('message', args=[message.id]), {'comment_submit': '', 'body': 'Benchmark'}, True
+        if poll is not None:
+            yield 'poll', 'get', reverse('poll', args=[poll.id]), None, False
+            choice = poll.choice_set.first()
+            if choice is not None:
+                yield 'vote', 'post', reverse('poll', args=[poll.id]), {'vote': '', 'choice': choice.id}, True
+        if event is not None:
+            yield 'event', 'get', reverse('event', args=[event.id]), None, False
+            yield 'rsvp', 'post', reverse('event', args=[event.id]), {'accepted': ''}, True
+        if other_room is not None:
+            yield 'join', 'get', reverse('join-room', args=[other_room.id]), None, True
+
+    def measure(self, client, name, method, url, data, mutates, iterations, warmup):
+        request = getattr(client, method)
+        durations, queries = [], []
+        for i in range(warmup + iterations):
+            # Actions are rolled back so every iteration starts from the same state.
+            with transaction.atomic() if mutates else nullcontext():
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = request(url, data) if data is not None else request(url)
+                    elapsed = time.perf_counter() - started
+                if mutates:
+                    transaction.set_rollback(True)
+            if response.status_code >= 400:
+                raise CommandError(f'{name}: {method.upper()} {url} returned {response.status_code}')
+            if i >= warmup:
+                durations.append(elapsed)
+                queries.append(len(captured))
+        return {
+            'name': name,
+            'method': method.upper(),
+            'path': url,
+            **summarize(durations),
+            'queries': max(queries, default=0),
+        }
+
+    def compare(self, before, after):
+        previous = {result['name']: result for result in before['results']}
+        self.stderr.write(f'Compared with {before.get("commit") or "previous run"}:')
+        for result in after['results']:
+            old = previous.get(result['name'])
+            if old is None:
+                continue
+            change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+            self.stderr.write(
+                f'{result["name"]:>16}: p50 {old["p50_ms"]:.2f} -> {result["p50_ms"]:.2f}ms ({change:+.0f}%)'
+                f'  queries {old["queries"]} -> {result["queries"]}'
+            )
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from base.notifications import drain
+
+
+class Command(BaseCommand):
+    help = 'Turn queued notification events into notifications, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.NOTIFICATION_OUTBOX_BATCH_SIZE,
+            help='Maximum number of events dispatched per transaction.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.NOTIFICATION_OUTBOX_FLUSH_INTERVAL,
+            help='Seconds to wait once the outbox is empty.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit as soon as the outbox is empty.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        try:
+            while True:
+                dispatched = drain(batch_size)
+                total += dispatched
+                if dispatched < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Dispatched {total} notification events')
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from base.export import stream
+from base.models import Room
+
+
+class Command(BaseCommand):
+    help = "Write a room's full history as JSON Lines, optionally gzip-compressed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('room', type=int)
+        parser.add_argument('--output', default='-', help='File to write; "-" is standard output.')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EXPORT_BATCH_SIZE,
+            help='Rows read per query.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            room = Room.objects.select_related('host').get(id=options['room'])
+        except Room.DoesNotExist:
+            raise CommandError(f'Room {options["room"]} does not exist')
+
+        if options['gzip'] and options['output'] == '-':
+            raise CommandError('--gzip needs --output')
+
+        chunks = stream(room, options['gzip'], options['batch_size'])
+        if options['output'] == '-':
+            # Uncompressed chunks always end on a line, so each decodes on its own.
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from base import dataset
+
+
+class Command(BaseCommand):
+    help = 'Add a reproducible synthetic dataset for benchmarks and capacity planning.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--rooms', type=int, default=1000)
+        parser.add_argument('--messages', type=int, default=100000)
+        parser.add_argument('--polls', type=int, help='Defaults to two per room.')
+        parser.add_argument('--events', type=int, help='Defaults to two per room.')
+        parser.add_argument('--seed', type=int, default=0, help='Same seed and sizes, same dataset.')
+        parser.add_argument(
+            '--giant-rooms',
+            type=int,
+            default=3,
+            help='Rooms that every user belongs to.'
+        )
+        parser.add_argument(
+            '--giant-share',
+            type=float,
+            default=0.5,
+            help='Fraction of the messages posted in the giant rooms.'
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help='Zipf exponent spreading the remaining messages over the other rooms; 0 is uniform.'
+        )
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread activity over.')
+        parser.add_argument(
+            '--unread-days',
+            type=int,
+            default=7,
+            help='Notifications younger than this are left unread.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Messages per transaction and rows per INSERT.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(counts):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{counts["messages"]} messages, {sum(counts.values())} rows')
+
+        counts = dataset.generate(
+            options['users'], options['rooms'], options['messages'], seed=options['seed'],
+            batch_size=options['batch_size'], giant_rooms=options['giant_rooms'],
+            giant_share=options['giant_share'], skew=options['skew'], polls=options['polls'],
+            events=options['events'], days=options['days'], unread_days=options['unread_days'],
+            progress=progress
+        )
+
+        elapsed = time.perf_counter() - started
+        for name, count in counts.items():
+            self.stdout.write(f'{name:>20}: {count}')
+        total = sum(counts.values())
+        self.stdout.write(f'Inserted {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from base.models import Poll
+from base.polls import tally
+
+
+class Command(BaseCommand):
+    help = 'Reconcile poll choice counters with the vote ledger, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of polls reconciled per statement.'
+        )
+        parser.add_argument(
+            '--poll',
+            type=int,
+            action='append',
+            dest='polls',
+            help='Only reconcile this poll; may be repeated.'
+        )
+        parser.add_argument(
+            '--open',
+            action='store_true',
+            help='Only reconcile polls that are still accepting votes.'
+        )
+
+    def handle(self, *args, **options):
+        polls = Poll.objects.order_by('id')
+        if options['polls']:
+            polls = polls.filter(id__in=options['polls'])
+        if options['open']:
+            polls = polls.filter(expires_at__gte=timezone.now())
+
+        poll_ids = list(polls.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        corrected = 0
+        for start in range(0, len(poll_ids), batch_size):
+            corrected += tally(poll_ids[start:start + batch_size])
+        self.stdout.write(f'Reconciled {len(poll_ids)} polls, corrected {corrected} choices')
@@ -0,0 +1,202 @@
+"""Per-view request metrics in Prometheus text format.
+
+``MetricsMiddleware`` times each request and files it under the URL name;
+SQL statements are counted by an execute wrapper installed on every new
+connection, and template time by the ``Templates`` backend. Everything the
+current request does is collected in a context variable, so queries run
+through ``sync_to_async`` are counted too.
+
+Metrics are kept per process, like the default Prometheus client registry:
+each worker has to be scraped on its own.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+
+UNMATCHED = 'unmatched'
+
+METRICS = {
+    'django_request_duration_seconds': ('histogram', 'Time spent handling the request.'),
+    'django_request_queries': ('histogram', 'SQL statements run by the request.'),
+    'django_request_sql_seconds': ('histogram', 'Time spent in SQL statements.'),
+    'django_request_template_seconds': ('histogram', 'Time spent rendering templates, including lazy queries.'),
+    'django_responses_total': ('counter', 'Responses sent, by status code.'),
+}
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql', 'template', 'rendering')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.rendering = False
+
+
+current = ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def record(self, view, status, duration, stats):
+        with self.lock:
+            for name, value, buckets in (
+                ('django_request_duration_seconds', duration, settings.METRICS_LATENCY_BUCKETS),
+                ('django_request_queries', stats.queries, settings.METRICS_QUERY_BUCKETS),
+                ('django_request_sql_seconds', stats.sql, settings.METRICS_LATENCY_BUCKETS),
+                ('django_request_template_seconds', stats.template, settings.METRICS_LATENCY_BUCKETS),
+            ):
+                histogram = self.histograms.get((name, view))
+                if histogram is None:
+                    histogram = self.histograms[name, view] = Histogram(buckets)
+                histogram.observe(value)
+            key = ('django_responses_total', view, status)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def exposition(self):
+        """Return every metric in the Prometheus text format, version 0.0.4."""
+        with self.lock:
+            histograms = {key: (list(h.counts), h.sum, h.buckets) for key, h in self.histograms.items()}
+            counters = dict(self.counters)
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, view, *rest), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{{view="{escape(view)}",status="{rest[0]}"}} {value}')
+            for (metric, view), (counts, total, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                label = f'view="{escape(view)}"'
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}}} {total}')
+                lines.append(f'{name}_count{{{label}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNMATCHED
+
+
+class MetricsMiddleware:
+    """Record latency, SQL and template time per URL name; put it first in ``MIDDLEWARE``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        registry.record(view_name(request), response.status_code, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        registry.record(view_name(request), response.status_code, time.perf_counter() - started, stats)
+        return response
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper adding each statement to the current request's stats."""
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql += time.perf_counter() - started
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` receiver wrapping the new connection with ``time_query``."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current.get()
+        # Only the outermost render is timed; render_to_string from inside a
+        # template tag is already part of it.
+        if stats is None or stats.rendering:
+            return super().render(context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template += time.perf_counter() - started
+            stats.rendering = False
+
+
+class Templates(DjangoTemplates):
+    """``DjangoTemplates`` whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
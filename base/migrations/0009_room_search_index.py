@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE base_room_fts USING fts5("
+        "title, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO base_room_fts(rowid, title, description) "
+        "SELECT id, title, COALESCE(description, '') FROM base_room"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE base_room_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0008_alter_event_accepted_alter_event_rejected_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
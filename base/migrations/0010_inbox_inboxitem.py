@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_inboxes(apps, schema_editor):
+    Room = apps.get_model('base', 'Room')
+    Notification = apps.get_model('base', 'Notification')
+    AdminNotification = apps.get_model('base', 'AdminNotification')
+    Inbox = apps.get_model('base', 'Inbox')
+    InboxItem = apps.get_model('base', 'InboxItem')
+
+    items = [
+        InboxItem(user_id=user_id, kind='n', notification_id=notification_id)
+        for notification_id, user_id in Notification.objects.filter(
+            read_status=False
+        ).values_list('id', 'action_to_id').iterator()
+    ]
+    admins = {}
+    for room_id, user_id in Room.admins.through.objects.values_list('room_id', 'user_id').iterator():
+        admins.setdefault(room_id, []).append(user_id)
+    for notification_id, room_id in AdminNotification.objects.filter(
+        read_status=False
+    ).values_list('id', 'room_id').iterator():
+        items += [
+            InboxItem(user_id=user_id, kind='a', admin_notification_id=notification_id)
+            for user_id in admins.get(room_id, [])
+        ]
+    InboxItem.objects.bulk_create(items, batch_size=1000)
+
+    counts = InboxItem.objects.values('user_id').annotate(
+        unread_notifications=Count('id', filter=Q(kind='n')),
+        unread_admin_notifications=Count('id', filter=Q(kind='a')),
+    ).order_by()
+    Inbox.objects.bulk_create([Inbox(**row) for row in counts], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('base', '0009_room_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Inbox',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inbox', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_notifications', models.PositiveIntegerField(default=0)),
+                ('unread_admin_notifications', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InboxItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('n', 'notification'), ('a', 'admin notification')], default='n', max_length=1)),
+                ('read_status', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('admin_notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='base.adminnotification')),
+                ('notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='base.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_items', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['user', 'kind', 'read_status', '-id'], name='inbox_item_unread_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_inboxes, migrations.RunPython.noop),
+    ]
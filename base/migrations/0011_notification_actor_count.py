@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def collapse_unread(apps, schema_editor):
+    Inbox = apps.get_model('base', 'Inbox')
+    InboxItem = apps.get_model('base', 'InboxItem')
+
+    for name in ('Notification', 'AdminNotification'):
+        model = apps.get_model('base', name)
+        groups = model.objects.filter(read_status=False).values(
+            'message_id', 'action_to_id', 'action_type'
+        ).annotate(
+            keep=Max('id'), rows=Count('id'), actors=Count('action_by_id', distinct=True)
+        ).filter(rows__gt=1).order_by()
+        for group in groups.iterator():
+            model.objects.filter(id=group['keep']).update(actor_count=group['actors'])
+            model.objects.filter(
+                read_status=False,
+                message_id=group['message_id'],
+                action_to_id=group['action_to_id'],
+                action_type=group['action_type'],
+            ).exclude(id=group['keep']).delete()
+
+    def unread(kind):
+        return Coalesce(Subquery(
+            InboxItem.objects.filter(
+                user_id=OuterRef('user_id'), kind=kind, read_status=False
+            ).order_by().values('user_id').annotate(count=Count('id')).values('count')
+        ), 0)
+
+    Inbox.objects.update(
+        unread_notifications=unread('n'),
+        unread_admin_notifications=unread('a'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_inbox_inboxitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminnotification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(collapse_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_likes(apps, schema_editor):
+    Message = apps.get_model('base', 'Message')
+    Message.objects.update(like_count=Coalesce(Subquery(
+        Message.likes.through.objects.filter(
+            message_id=OuterRef('id')
+        ).order_by().values('message_id').annotate(count=Count('id')).values('count')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_message_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
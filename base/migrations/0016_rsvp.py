@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def copy_rsvps(apps, schema_editor):
+    Event = apps.get_model('base', 'Event')
+    Rsvp = apps.get_model('base', 'Rsvp')
+    # Someone in both lists keeps their acceptance.
+    for status, through in (('a', Event.accepted.through), ('r', Event.rejected.through)):
+        Rsvp.objects.bulk_create(
+            (Rsvp(event_id=event_id, user_id=user_id, status=status)
+             for event_id, user_id in through.objects.values_list('event_id', 'user_id').iterator()),
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+    for status, counter in (('a', 'accepted_count'), ('r', 'rejected_count')):
+        Event.objects.update(**{counter: Coalesce(Subquery(
+            Rsvp.objects.filter(event_id=OuterRef('id'), status=status)
+            .order_by().values('event_id').annotate(count=Count('id')).values('count')
+        ), 0)})
+
+
+def restore_lists(apps, schema_editor):
+    Event = apps.get_model('base', 'Event')
+    Rsvp = apps.get_model('base', 'Rsvp')
+    for status, through in (('a', Event.accepted.through), ('r', Event.rejected.through)):
+        through.objects.bulk_create(
+            (through(event_id=event_id, user_id=user_id)
+             for event_id, user_id in Rsvp.objects.filter(status=status).values_list('event_id', 'user_id').iterator()),
+            batch_size=1000
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_vote'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='accepted_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rejected_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Rsvp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('a', 'accepted'), ('r', 'rejected')], max_length=1)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rsvps', to='base.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rsvps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('event', 'user'), name='rsvp_event_user_unique')],
+            },
+        ),
+        migrations.RunPython(copy_rsvps, restore_lists),
+        migrations.RemoveField(
+            model_name='event',
+            name='accepted',
+        ),
+        migrations.RemoveField(
+            model_name='event',
+            name='rejected',
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def fill_actors(apps, schema_editor):
+    """Rebuild the actor lists of unread aggregates from the likes and comments on their messages.
+
+    The most recent ``actor_count`` distinct actors are taken, latest last.
+    Read aggregates never change again, so they are left empty.
+    """
+    Message = apps.get_model('base', 'Message')
+    Comment = apps.get_model('base', 'Comment')
+    Like = Message.likes.through
+    for name in ('Notification', 'AdminNotification'):
+        model = apps.get_model('base', name)
+        for notification in model.objects.filter(read_status=False):
+            if notification.action_type == 'l':
+                users = Like.objects.filter(message_id=notification.message_id).order_by('-id').values_list(
+                    'user_id', flat=True
+                )
+            else:
+                users = Comment.objects.filter(message_id=notification.message_id).order_by(
+                    '-created', '-id'
+                ).values_list('author_id', flat=True)
+            actors = [notification.action_by_id]
+            for user_id in users:
+                if len(actors) >= notification.actor_count:
+                    break
+                if user_id not in actors:
+                    actors.append(user_id)
+            notification.actors = actors[::-1]
+            notification.actor_count = len(actors)
+            notification.save(update_fields=['actors', 'actor_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0021_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adminnotification',
+            name='actors',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actors',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(fill_actors, migrations.RunPython.noop),
+    ]
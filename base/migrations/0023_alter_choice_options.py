@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Catch the migration state up with Choice, which lost its Meta options before the inbox work.
+
+    State only; no SQL is run.
+    """
+
+    dependencies = [
+        ('base', '0022_notification_actors'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='choice',
+            options={},
+        ),
+    ]
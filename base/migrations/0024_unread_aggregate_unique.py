@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:30
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold duplicate unread aggregates into their oldest row before they become unique.
+
+    The other rows are deleted along with their inbox items, and the unread
+    counters of those items' owners go down to match.
+    """
+    Inbox = apps.get_model('base', 'Inbox')
+    InboxItem = apps.get_model('base', 'InboxItem')
+    for name, field, counter in (('Notification', 'notification', 'unread_notifications'),
+                                 ('AdminNotification', 'admin_notification', 'unread_admin_notifications')):
+        model = apps.get_model('base', name)
+        groups = model.objects.filter(read_status=False).values(
+            'message_id', 'action_to_id', 'action_type'
+        ).annotate(rows=Count('id')).filter(rows__gt=1).order_by()
+        for group in groups:
+            del group['rows']
+            keep, *extra = model.objects.filter(read_status=False, **group).order_by('id')
+            for row in extra:
+                for actor in row.actors:
+                    if actor in keep.actors:
+                        keep.actors.remove(actor)
+                    keep.actors.append(actor)
+            if keep.actors:
+                keep.action_by_id = keep.actors[-1]
+                keep.actor_count = len(keep.actors)
+            keep.save(update_fields=['actors', 'action_by_id', 'actor_count'])
+
+            extra_ids = [row.id for row in extra]
+            unread = Counter(InboxItem.objects.filter(
+                **{f'{field}_id__in': extra_ids}, read_status=False
+            ).values_list('user_id', flat=True))
+            model.objects.filter(id__in=extra_ids).delete()
+            for user_id, count in unread.items():
+                Inbox.objects.filter(user_id=user_id).update(**{counter: Greatest(F(counter) - count, 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0023_alter_choice_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='adminnotification',
+            name='admin_notif_unread_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_unread_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='adminnotification',
+            constraint=models.UniqueConstraint(condition=models.Q(('read_status', False)), fields=('message', 'action_to', 'action_type'), name='admin_notif_unread_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('read_status', False)), fields=('message', 'action_to', 'action_type'), name='notification_unread_unique'),
+        ),
+    ]
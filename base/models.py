@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
 from django import forms
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.utils import timezone
 # Create your models here.
 
@@ -15,9 +17,18 @@ class Room(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     suspended_members = models.ManyToManyField(User, related_name='suspended_members', blank=True)
     pending_requests = models.ManyToManyField(User, related_name='pending_requests', blank=True)
+    retention_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Days before messages move to the archive; empty uses the site default.'
+    )
 
     class Meta:
         ordering = ['-updated', '-created']
+        indexes = [
+            # Room lists walk this newest first and stop once a page is full.
+            models.Index(fields=['updated', 'created'], name='room_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -29,14 +40,46 @@ class Message(models.Model):
     body = models.TextField()
     likes = models.ManyToManyField(User, related_name='liked_messages', blank=True)
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     hidden_status = models.BooleanField(default=False)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['room', 'hidden_status', 'created'], name='message_feed_idx'),
+        ]
 
     def __str__(self):
         return self.body
 
+    def is_liked_by(self, user):
+        return Message.likes.through.objects.filter(message_id=self.id, user_id=user.id).exists()
+
+    def toggle_like(self, user):
+        """Like or unlike the message for ``user``; return True if it is now liked.
+
+        Liking is an ``INSERT`` and an ``F()`` update of ``like_count``; when
+        the insert hits the unique constraint the like is removed instead.
+        Neither path depends on how many likes there are.
+        """
+        Like = Message.likes.through
+        try:
+            with transaction.atomic():
+                Like.objects.create(message_id=self.id, user_id=user.id)
+                Message.objects.filter(id=self.id).update(like_count=F('like_count') + 1)
+        except IntegrityError:
+            with transaction.atomic():
+                deleted, _ = Like.objects.filter(message_id=self.id, user_id=user.id).delete()
+                # Nothing deleted means a concurrent request unliked it first.
+                if deleted:
+                    Message.objects.filter(id=self.id).update(like_count=Greatest(F('like_count') - deleted, 0))
+            self.like_count = max(self.like_count - deleted, 0)
+            return False
+        self.like_count += 1
+        return True
+
 
 class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -48,24 +91,79 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['message', 'created'], name='comment_message_idx'),
+        ]
 
     def __str__(self):
         return self.body
 
+
+class ArchivedMessage(models.Model):
+    """A message moved out of the hot tables by ``base.archive``.
+
+    It keeps the message's id. Its comments, likes and notifications are
+    packed with it into ``payload`` as zlib-compressed JSON.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='archived_messages')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created = models.DateTimeField()
+    hidden_status = models.BooleanField(default=False)
+    archived = models.DateTimeField(auto_now_add=True)
+    payload = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'created'], name='archived_message_room_idx'),
+        ]
+
+    def __str__(self):
+        return f'Archived message {self.id}'
+
 class Event(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
-    rejected = models.ManyToManyField(User, related_name='rejected_events', blank=True)
-    accepted = models.ManyToManyField(User, related_name='accepted_events', blank=True)
     starts_at = models.DateTimeField('Start time of event')
     expires_at = models.DateTimeField('End time of event')
+    accepted_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
 
 
     def __str__(self):
         return self.title
 
+    @property
+    def accepted(self):
+        return User.objects.filter(rsvps__event=self, rsvps__status='a')
+
+    @property
+    def rejected(self):
+        return User.objects.filter(rsvps__event=self, rsvps__status='r')
+
+    def rsvp_status(self, user):
+        """'a' or 'r' if ``user`` already answered, otherwise None."""
+        return Rsvp.objects.filter(event_id=self.id, user_id=user.id).values_list('status', flat=True).first()
+
+    def respond(self, user, status):
+        """Record ``user``'s answer; return False if they had already answered.
+
+        Answering again is a no-op: the unique (event, user) row rejects the
+        insert and the counters are only bumped for new answers.
+        """
+        counter = RSVP_COUNTERS[status]
+        try:
+            with transaction.atomic():
+                Rsvp.objects.create(event_id=self.id, user_id=user.id, status=status)
+                Event.objects.filter(id=self.id).update(**{counter: F(counter) + 1})
+        except IntegrityError:
+            return False
+        setattr(self, counter, getattr(self, counter) + 1)
+        return True
+
     def has_started(self):
         return timezone.now() > self.starts_at
 
@@ -74,6 +172,36 @@ class Event(models.Model):
 
     class Meta:
         ordering = ['expires_at', '-starts_at']
+        indexes = [
+            models.Index(fields=['room', 'expires_at'], name='event_room_expires_idx'),
+            models.Index(fields=['room', 'starts_at'], name='event_room_starts_idx'),
+        ]
+
+
+RSVP_STATUS = (
+    ('a', 'accepted'),
+    ('r', 'rejected')
+)
+
+RSVP_COUNTERS = {
+    'a': 'accepted_count',
+    'r': 'rejected_count',
+}
+
+
+class Rsvp(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='rsvps')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rsvps')
+    status = models.CharField(max_length=1, choices=RSVP_STATUS)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='rsvp_event_user_unique')
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.get_status_display()} {self.event}'
 
 class Poll(models.Model):
     question = models.CharField(max_length=200)
@@ -81,11 +209,29 @@ class Poll(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     starts_at = models.DateTimeField('Start time of poll')
     expires_at = models.DateTimeField('End time of voting')
-    voted_users = models.ManyToManyField(User, related_name='voted_polls', blank=True)
+    voted_users = models.ManyToManyField(User, through='Vote', related_name='voted_polls', blank=True)
+    updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.question
 
+    def voted_by(self, user):
+        return Vote.objects.filter(poll_id=self.id, user_id=user.id).exists()
+
+    def cast_vote(self, user, choice):
+        """Record ``user``'s vote for ``choice``; return False if they already voted.
+
+        The unique (poll, user) row in the ledger is what decides whether the
+        vote counts, so concurrent submissions cannot both be tallied.
+        """
+        try:
+            with transaction.atomic():
+                Vote.objects.create(poll_id=self.id, user_id=user.id, choice_id=choice.id)
+                Choice.objects.filter(id=choice.id).update(votes=F('votes') + 1)
+        except IntegrityError:
+            return False
+        return True
+
     def has_started(self):
         return timezone.now() > self.starts_at
 
@@ -94,6 +240,10 @@ class Poll(models.Model):
 
     class Meta:
         ordering = ['expires_at', '-starts_at']
+        indexes = [
+            models.Index(fields=['room', 'expires_at'], name='poll_room_expires_idx'),
+            models.Index(fields=['room', 'starts_at'], name='poll_room_starts_idx'),
+        ]
 
 class Choice(models.Model):
     text = models.CharField(max_length=200)
@@ -103,6 +253,22 @@ class Choice(models.Model):
     def __str__(self):
         return self.text
 
+
+class Vote(models.Model):
+    # Reuses the table of the former auto-created voted_users relation, so
+    # votes cast before the ledger existed have no choice.
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, null=True, blank=True, on_delete=models.CASCADE)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'base_poll_voted_users'
+        unique_together = [('poll', 'user')]
+
+    def __str__(self):
+        return f'{self.user} on {self.poll}'
+
 ACTION_TYPE = (
     ('c', 'commented'),
     ('l', 'liked')
@@ -120,6 +286,24 @@ class Notification(models.Model):
         default='c',
         help_text='Description of notification'
     )
+    actor_count = models.PositiveIntegerField(default=1)
+    # Users counted in actor_count, latest last; only kept up while unread.
+    actors = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['action_to', 'read_status'], name='notification_recipient_idx'),
+        ]
+        constraints = [
+            # Unread rows are the only ones new likes and comments coalesce
+            # into, so there is at most one per message, recipient and action.
+            models.UniqueConstraint(
+                fields=['message', 'action_to', 'action_type'],
+                condition=models.Q(read_status=False),
+                name='notification_unread_unique'
+            ),
+        ]
+
     def __str__(self):
         return str(self.action_by) + ' to ' + str(self.action_to)
 
@@ -135,6 +319,71 @@ class AdminNotification(models.Model):
         default='c',
         help_text='Description of admin notification'
     )
+    actor_count = models.PositiveIntegerField(default=1)
+    # Users counted in actor_count, latest last; only kept up while unread.
+    actors = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'read_status'], name='admin_notif_room_idx'),
+        ]
+        constraints = [
+            # Unread rows are the only ones new likes and comments coalesce
+            # into, so there is at most one per message, recipient and action.
+            models.UniqueConstraint(
+                fields=['message', 'action_to', 'action_type'],
+                condition=models.Q(read_status=False),
+                name='admin_notif_unread_unique'
+            ),
+        ]
 
     def __str__(self):
         return str(self.action_by) + ' to ' + str(self.action_to)
+
+
+class NotificationEvent(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    action_by = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    action_to = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    message = models.ForeignKey(Message, on_delete=models.CASCADE)
+    action_type = models.CharField(max_length=1, choices=ACTION_TYPE, default='c')
+    retract = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return ('retract ' if self.retract else '') + self.get_action_type_display() + ' by ' + str(self.action_by)
+
+
+INBOX_KIND = (
+    ('n', 'notification'),
+    ('a', 'admin notification')
+)
+
+class Inbox(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='inbox')
+    unread_notifications = models.PositiveIntegerField(default=0)
+    unread_admin_notifications = models.PositiveIntegerField(default=0)
+
+    @property
+    def unread_total(self):
+        return self.unread_notifications + self.unread_admin_notifications
+
+    def __str__(self):
+        return 'Inbox of ' + str(self.user)
+
+class InboxItem(models.Model):
+    user = models.ForeignKey(User, related_name='inbox_items', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=1, choices=INBOX_KIND, default='n')
+    notification = models.ForeignKey(Notification, null=True, blank=True, on_delete=models.CASCADE)
+    admin_notification = models.ForeignKey(AdminNotification, null=True, blank=True, on_delete=models.CASCADE)
+    read_status = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['user', 'kind', 'read_status', '-id'], name='inbox_item_unread_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.notification or self.admin_notification) + ' for ' + str(self.user)
@@ -0,0 +1,353 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Room, Message, Notification, AdminNotification, Inbox, InboxItem, NotificationEvent
+
+
+INBOX_SIZE = 10
+DISPATCH_ATTEMPTS = 3
+
+
+def save_notification(
+                      room: Room,
+                      action_by: User,
+                      message: Message,
+                      action_to: User,
+                      action_type: str,
+                      ) -> None:
+    """Notify the message author and the room admins about an action.
+
+    An unread notification of the same type on the same message is updated
+    in place ("X and 41 others liked your message") instead of adding rows.
+    """
+    record(NotificationEvent(
+        room=room,
+        action_by=action_by,
+        action_to=action_to,
+        message=message,
+        action_type=action_type
+    ))
+
+
+def retract_notification(
+                         room: Room,
+                         action_by: User,
+                         message: Message,
+                         action_to: User,
+                         action_type: str,
+                         ) -> None:
+    """Take back one action, e.g. when a like is undone.
+
+    The actor is dropped from the unread aggregate; when they were the only
+    actor the notification is removed altogether.
+    """
+    record(NotificationEvent(
+        room=room,
+        action_by=action_by,
+        action_to=action_to,
+        message=message,
+        action_type=action_type,
+        retract=True
+    ))
+
+
+def record(event: NotificationEvent) -> None:
+    """Apply the event now, or leave it in the outbox for the dispatch worker."""
+    if getattr(settings, 'NOTIFICATION_DISPATCH', 'outbox') == 'outbox':
+        event.save()
+    else:
+        dispatch([event])
+
+
+def drain(batch_size: int = 500) -> int:
+    """Dispatch and remove the oldest outbox events; return how many there were."""
+    with transaction.atomic():
+        events = list(NotificationEvent.objects.order_by('id')[:batch_size])
+        if events:
+            dispatch(events)
+            NotificationEvent.objects.filter(id__in=[event.id for event in events]).delete()
+    return len(events)
+
+
+def dispatch(events: list) -> None:
+    """Fold a batch of events into Notification and AdminNotification rows.
+
+    A concurrent dispatch may insert the same unread aggregate first. The
+    unique constraint rejects the second insert, and the batch is replayed
+    against the row that won.
+    """
+    with transaction.atomic():
+        for model in (Notification, AdminNotification):
+            for attempt in range(DISPATCH_ATTEMPTS):
+                try:
+                    with transaction.atomic():
+                        apply_events(model, events)
+                    break
+                except IntegrityError:
+                    if attempt == DISPATCH_ATTEMPTS - 1:
+                        raise
+
+
+def apply_events(model, events: list) -> None:
+    """Replay events against the unread aggregates of one notification model.
+
+    Each aggregate keeps the ids of its actors, so someone who acts twice is
+    counted once and a retraction only counts for an actor it holds.
+    Existing aggregates get one ``UPDATE`` per message, new ones are
+    inserted with a single ``bulk_create``.
+    """
+    def key(item):
+        return item.message_id, item.action_to_id, item.action_type
+
+    keys = {key(event) for event in events}
+    existing = {}
+    for row in model.objects.filter(
+        read_status=False, message_id__in={message_id for message_id, _, _ in keys}
+    ).order_by('id').select_for_update():
+        if key(row) in keys:
+            existing[key(row)] = row
+
+    aggregates = dict(existing)
+    changed = set()
+    for event in events:
+        aggregate = aggregates.get(key(event))
+        if not event.retract:
+            if aggregate is None:
+                aggregate = aggregates[key(event)] = model(
+                    action_to_id=event.action_to_id,
+                    room_id=event.room_id,
+                    message_id=event.message_id,
+                    action_type=event.action_type
+                )
+            elif event.action_by_id in aggregate.actors:
+                aggregate.actors.remove(event.action_by_id)
+            aggregate.actors.append(event.action_by_id)
+        else:
+            if aggregate is None or event.action_by_id not in aggregate.actors:
+                continue
+            aggregate.actors.remove(event.action_by_id)
+            if not aggregate.actors:
+                del aggregates[key(event)]
+                continue
+        aggregate.action_by_id = aggregate.actors[-1]
+        aggregate.actor_count = len(aggregate.actors)
+        changed.add(key(event))
+
+    for row_key, row in existing.items():
+        if aggregates.get(row_key) is not row:
+            discard(row)
+        elif row_key in changed:
+            model.objects.filter(id=row.id).update(
+                action_by_id=row.action_by_id,
+                actor_count=row.actor_count,
+                actors=row.actors
+            )
+    deliver_many(model.objects.bulk_create([
+        aggregate for aggregate in aggregates.values() if aggregate.pk is None
+    ]))
+
+
+INBOX_FIELDS = {
+    Notification: ('n', 'notification', 'unread_notifications'),
+    AdminNotification: ('a', 'admin_notification', 'unread_admin_notifications'),
+}
+
+
+def deliver_many(notifications: list) -> None:
+    """Fan new notifications out to their recipients' inboxes.
+
+    User notifications go to ``action_to``. Admin notifications get one item
+    per room admin, so reading an admin inbox never has to join through
+    ``Room.admins``.
+    """
+    if not notifications:
+        return
+    kind, field, counter = INBOX_FIELDS[type(notifications[0])]
+
+    if kind == 'a':
+        admins = defaultdict(list)
+        for room_id, user_id in Room.admins.through.objects.filter(
+            room_id__in={notification.room_id for notification in notifications}
+        ).values_list('room_id', 'user_id'):
+            admins[room_id].append(user_id)
+        targets = [
+            (notification, user_id)
+            for notification in notifications
+            for user_id in admins[notification.room_id]
+        ]
+    else:
+        targets = [(notification, notification.action_to_id) for notification in notifications]
+
+    InboxItem.objects.bulk_create([
+        InboxItem(user_id=user_id, kind=kind, **{field: notification})
+        for notification, user_id in targets
+    ])
+
+    increments = defaultdict(list)
+    for user_id, amount in Counter(user_id for _, user_id in targets).items():
+        increments[amount].append(user_id)
+    Inbox.objects.bulk_create(
+        [Inbox(user_id=user_id) for user_ids in increments.values() for user_id in user_ids],
+        ignore_conflicts=True
+    )
+    for amount, user_ids in increments.items():
+        Inbox.objects.filter(user_id__in=user_ids).update(**{counter: F(counter) + amount})
+
+
+def deliver(notification) -> None:
+    deliver_many([notification])
+
+
+def discard(notification) -> None:
+    """Delete a notification along with its inbox items and unread counts."""
+    kind, field, counter = INBOX_FIELDS[type(notification)]
+    user_ids = list(InboxItem.objects.filter(
+        **{field: notification}, read_status=False
+    ).values_list('user_id', flat=True))
+    notification.delete()
+    Inbox.objects.filter(user_id__in=user_ids).update(**{counter: Greatest(F(counter) - 1, 0)})
+
+
+def mark_notification_read(notification: Notification) -> None:
+    with transaction.atomic():
+        updated = Notification.objects.filter(id=notification.id, read_status=False).update(read_status=True)
+        if not updated:
+            return
+        notification.read_status = True
+        read = InboxItem.objects.filter(notification=notification, read_status=False).update(read_status=True)
+        if read:
+            Inbox.objects.filter(user_id=notification.action_to_id).update(
+                unread_notifications=Greatest(F('unread_notifications') - 1, 0)
+            )
+
+
+def mark_admin_notification_read(admin_notification: AdminNotification) -> None:
+    with transaction.atomic():
+        updated = AdminNotification.objects.filter(
+            id=admin_notification.id, read_status=False
+        ).update(read_status=True)
+        if not updated:
+            return
+        admin_notification.read_status = True
+        items = InboxItem.objects.filter(admin_notification=admin_notification, read_status=False)
+        user_ids = list(items.values_list('user_id', flat=True))
+        items.update(read_status=True)
+        Inbox.objects.filter(user_id__in=user_ids).update(
+            unread_admin_notifications=Greatest(F('unread_admin_notifications') - 1, 0)
+        )
+
+
+def mark_all_read(user: User) -> Inbox:
+    return bulk_mark_read(user)
+
+
+def mark_read_up_to(user: User, notification_id: int | None = None,
+                    admin_notification_id: int | None = None) -> Inbox:
+    """Mark everything up to and including the given ids as read.
+
+    Either id may be None to leave that kind of notification untouched.
+    """
+    return bulk_mark_read(
+        user,
+        Q(id__lte=notification_id) if notification_id is not None else None,
+        Q(id__lte=admin_notification_id) if admin_notification_id is not None else None,
+    )
+
+
+def mark_shown_read(user: User, notification_ids=(), admin_notification_ids=()) -> Inbox:
+    """Mark exactly the given notifications read, e.g. the ones a page showed."""
+    return bulk_mark_read(
+        user,
+        Q(id__in=notification_ids) if notification_ids else None,
+        Q(id__in=admin_notification_ids) if admin_notification_ids else None,
+    )
+
+
+def mark_room_read(user: User, room: Room) -> Inbox:
+    return bulk_mark_read(user, Q(room=room), Q(room=room))
+
+
+def bulk_mark_read(user: User, notification_filter: Q | None = Q(),
+                   admin_filter: Q | None = Q()) -> Inbox:
+    """Mark the user's matching notifications read and return fresh counters.
+
+    Each notification model is updated with a single ``UPDATE`` that carries
+    the ownership filter; a filter of None skips that model.
+    """
+    with transaction.atomic():
+        if notification_filter is not None:
+            Notification.objects.filter(
+                notification_filter, action_to=user, read_status=False
+            ).update(read_status=True)
+            InboxItem.objects.filter(
+                user=user, kind='n', read_status=False, notification__read_status=True
+            ).update(read_status=True)
+
+        user_ids = {user.id}
+        if admin_filter is not None:
+            AdminNotification.objects.filter(
+                admin_filter, room__admins=user, read_status=False
+            ).update(read_status=True)
+            read_ids = InboxItem.objects.filter(
+                user=user, kind='a', read_status=False, admin_notification__read_status=True
+            ).values('admin_notification_id')
+            items = InboxItem.objects.filter(admin_notification_id__in=read_ids, read_status=False)
+            user_ids.update(items.order_by().values_list('user_id', flat=True))
+            items.update(read_status=True)
+
+        recount_many(user_ids)
+    return get_inbox(user)
+
+
+def recount_many(user_ids) -> None:
+    """Recompute the counters of many users with one ``UPDATE``."""
+    def unread(kind):
+        return Coalesce(Subquery(
+            InboxItem.objects.filter(
+                user_id=OuterRef('user_id'), kind=kind, read_status=False
+            ).order_by().values('user_id').annotate(count=Count('id')).values('count')
+        ), 0)
+
+    Inbox.objects.filter(user_id__in=user_ids).update(
+        unread_notifications=unread('n'),
+        unread_admin_notifications=unread('a'),
+    )
+
+
+def recount(user: User) -> Inbox:
+    """Recompute a user's unread counters from their inbox items."""
+    unread = InboxItem.objects.filter(user=user, read_status=False)
+    inbox, _ = Inbox.objects.update_or_create(
+        user=user,
+        defaults={
+            'unread_notifications': unread.filter(kind='n').count(),
+            'unread_admin_notifications': unread.filter(kind='a').count(),
+        }
+    )
+    return inbox
+
+
+def get_inbox(user: User) -> Inbox:
+    try:
+        return Inbox.objects.get(user=user)
+    except Inbox.DoesNotExist:
+        return recount(user)
+
+
+def unread_notifications(user: User, limit: int = INBOX_SIZE) -> list:
+    items = InboxItem.objects.filter(user=user, kind='n', read_status=False).select_related(
+        'notification__action_by', 'notification__room'
+    )[:limit]
+    return [item.notification for item in items]
+
+
+def unread_admin_notifications(user: User, limit: int = INBOX_SIZE) -> list:
+    items = InboxItem.objects.filter(user=user, kind='a', read_status=False).select_related(
+        'admin_notification__action_by', 'admin_notification__action_to', 'admin_notification__room'
+    )[:limit]
+    return [item.admin_notification for item in items]
@@ -0,0 +1,105 @@
+"""Whole-response cache for pages that look the same to every anonymous visitor.
+
+A page's entries live under a version number that ``invalidate`` bumps, so
+one increment retires every query-string variant at once. The last response
+rendered for each query string is also kept, outside the version, so that
+while one request re-renders a retired page the others are served that copy
+instead of all hitting the database together.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+
+def version_key(name):
+    return f'page:{name}:version'
+
+
+def get_version(name):
+    version = cache.get(version_key(name))
+    if version is None:
+        # Pick a fresh start so a restarted process never reuses old entries.
+        cache.add(version_key(name), time.time_ns())
+        version = cache.get(version_key(name))
+    return version
+
+
+def bump(name):
+    try:
+        cache.incr(version_key(name))
+    except ValueError:
+        cache.add(version_key(name), time.time_ns())
+
+
+def invalidate(name):
+    """Retire the cached copies of page ``name``, now and again once committed."""
+    bump(name)
+    transaction.on_commit(lambda: bump(name))
+
+
+def page_keys(name, request):
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+    base = f'page:{name}:{query}'
+    return f'{base}:{get_version(name)}', f'{base}:stale', f'{base}:lock'
+
+
+def freeze(response):
+    return response.status_code, response.content, response['Content-Type']
+
+
+def thaw(entry):
+    status, content, content_type = entry
+    return HttpResponse(content, status=status, content_type=content_type)
+
+
+def wait_for(key):
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cache_anonymous_page(name):
+    """Serve anonymous GET requests for the decorated view from the cache.
+
+    Only one request per page and query string renders a missing entry at a
+    time. The rest get the previous copy, or, when there is none yet, wait up
+    to ``PAGE_CACHE_LOCK_WAIT`` seconds for the new one before rendering it
+    themselves.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            key, stale_key, lock_key = page_keys(name, request)
+            entry = cache.get(key)
+            if entry is not None:
+                return thaw(entry)
+
+            if not cache.add(lock_key, True, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                entry = cache.get(stale_key) or wait_for(key)
+                if entry is not None:
+                    return thaw(entry)
+                return view(request, *args, **kwargs)
+
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    entry = freeze(response)
+                    cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+                    cache.set(stale_key, entry, settings.PAGE_CACHE_STALE_TIMEOUT)
+            finally:
+                cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
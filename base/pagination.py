@@ -0,0 +1,91 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str | None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def cursor_for(item, ordering: list) -> str:
+    return encode_cursor([getattr(item, field.lstrip('-')) for field in ordering])
+
+
+def decode_cursor(cursor: str, model, ordering: list) -> list | None:
+    """Turn a cursor back into field values, or None if it is not valid."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+    try:
+        return [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except ValidationError:
+        return None
+
+
+def keyset_filter(ordering: list, values: list) -> Q:
+    """Build the filter selecting rows strictly after ``values`` in ``ordering``.
+
+    For ``['-updated', '-id']`` this is
+    ``updated < v0 OR (updated = v0 AND id < v1)``.
+    """
+    query = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            condition &= Q(**{previous.lstrip('-'): value})
+        query |= condition
+    return query
+
+
+def keyset_page(queryset, ordering: list, cursor: str | None = None, per_page: int = 20) -> KeysetPage:
+    """Return the page of ``queryset`` that follows ``cursor``.
+
+    ``ordering`` must end with a unique field (normally ``id``) so every row
+    has a distinct position. Pages are fetched with one ``LIMIT`` query and
+    never with ``OFFSET`` or ``COUNT``.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(ordering, values))
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = cursor_for(items[-1], ordering)
+    return KeysetPage(items=items, next_cursor=next_cursor)
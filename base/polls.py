@@ -0,0 +1,54 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Choice, Vote
+
+
+def channel(poll_id):
+    return f'poll:{poll_id}'
+
+
+def current_tallies(poll_id):
+    return dict(Choice.objects.filter(poll_id=poll_id).order_by('id').values_list('id', 'votes'))
+
+
+def tally_snapshot(poll_id):
+    """Return the poll's tallies and the id of the last vote they include.
+
+    Both come from one statement, so they describe the same moment. SQLite
+    has a single writer, so vote ids are handed out in commit order.
+    """
+    last_vote = Vote.objects.filter(poll_id=OuterRef('poll_id')).order_by('-id').values('id')[:1]
+    rows = Choice.objects.filter(poll_id=poll_id).order_by('id').annotate(
+        last_vote=Subquery(last_vote)
+    ).values_list('id', 'votes', 'last_vote')
+    tallies, last = {}, 0
+    for choice_id, votes, last_vote_id in rows:
+        tallies[choice_id] = votes
+        last = last_vote_id or 0
+    return tallies, last
+
+
+def tally_counts():
+    """Per-choice vote counts as recorded in the ledger, for annotations."""
+    return Coalesce(Subquery(
+        Vote.objects.filter(choice_id=OuterRef('id'))
+        .order_by().values('choice_id').annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def tally(poll_ids):
+    """Reconcile ``Choice.votes`` with the ledger for ``poll_ids``.
+
+    Polls still holding votes from before the ledger recorded choices are
+    left alone, since their counters cannot be rebuilt. Returns the number
+    of choices that were corrected.
+    """
+    legacy = Vote.objects.filter(poll_id__in=poll_ids, choice__isnull=True).values('poll_id')
+    drifted = (
+        Choice.objects.filter(poll_id__in=poll_ids)
+        .exclude(poll_id__in=legacy)
+        .annotate(tallied=tally_counts())
+        .filter(~Q(votes=F('tallied')))
+    )
+    return Choice.objects.filter(id__in=drifted.values('id')).update(votes=tally_counts())
@@ -0,0 +1,95 @@
+"""Publish/subscribe for pushing updates to streaming responses.
+
+Messages are published from request threads, normally once the
+transaction commits, and consumed by async views served through
+``ideal_train/asgi.py``. ``LocalBroker`` only reaches subscribers in its
+own process; ``PUBSUB_BROKER`` can name any class with the same
+``subscribe``/``publish`` interface backed by a shared server.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Messages for one subscriber, queued on the event loop that subscribed."""
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        # Set when messages were dropped; the consumer should resynchronise.
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """Wait for the next message; raise ``TimeoutError`` after ``timeout`` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def drain(self):
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return messages
+
+
+class LocalBroker:
+    """In-process broker for development, tests and single-worker deployments."""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or settings.PUBSUB_QUEUE_SIZE
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscription = Subscription(channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscriptions = self._channels[channel]
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._channels[channel]
+
+    def publish(self, channel, message):
+        """Queue ``message`` for every subscriber of ``channel``; safe from any thread."""
+        with self._lock:
+            subscriptions = list(self._channels.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                pass
+        return len(subscriptions)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.PUBSUB_BROKER)()
+    return _broker
+
+
+def publish_on_commit(channel, message):
+    transaction.on_commit(lambda: get_broker().publish(channel, message))
@@ -0,0 +1,121 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Room
+
+
+ROLE_FIELDS = {
+    'is_admin': 'admins',
+    'is_member': 'members',
+    'is_suspended': 'suspended_members',
+    'is_pending': 'pending_requests',
+}
+
+
+@dataclass(frozen=True)
+class RoomRole:
+    is_host: bool = False
+    is_admin: bool = False
+    is_member: bool = False
+    is_suspended: bool = False
+    is_pending: bool = False
+
+    @property
+    def name(self) -> str:
+        for role in ('host', 'admin', 'suspended', 'member', 'pending'):
+            if getattr(self, 'is_' + role):
+                return role
+        return 'none'
+
+    @property
+    def can_post(self) -> bool:
+        return self.is_member and not self.is_suspended
+
+
+NO_ROLE = RoomRole()
+
+_cache = {}
+_cache_size = 0
+_lock = threading.Lock()
+
+
+def get_role(user, room) -> RoomRole:
+    """Return what ``user`` is in ``room`` (a Room or a room id).
+
+    Looked up with one query that probes each membership table's
+    (room_id, user_id) index, then cached in this process until the
+    memberships change or ``ROOM_ROLE_CACHE_TTL`` seconds pass.
+    """
+    if not user.is_authenticated:
+        return NO_ROLE
+    room_id = room.id if isinstance(room, Room) else int(room)
+
+    now = time.monotonic()
+    cached = _cache.get(room_id, {}).get(user.id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    role = fetch_role(user.id, room_id)
+    remember(room_id, user.id, role, now + getattr(settings, 'ROOM_ROLE_CACHE_TTL', 60))
+    return role
+
+
+def fetch_role(user_id: int, room_id: int) -> RoomRole:
+    def exists(field):
+        return Exists(getattr(Room, field).through.objects.filter(room_id=OuterRef('id'), user_id=user_id))
+
+    row = Room.objects.filter(id=room_id).annotate(
+        **{flag: exists(field) for flag, field in ROLE_FIELDS.items()}
+    ).values('host_id', *ROLE_FIELDS).order_by().first()
+    if row is None:
+        return NO_ROLE
+    return RoomRole(is_host=row.pop('host_id') == user_id, **row)
+
+
+def remember(room_id: int, user_id: int, role: RoomRole, expires: float) -> None:
+    global _cache_size
+    with _lock:
+        if _cache_size >= getattr(settings, 'ROOM_ROLE_CACHE_SIZE', 100000):
+            _cache.clear()
+            _cache_size = 0
+        users = _cache.setdefault(room_id, {})
+        if user_id not in users:
+            _cache_size += 1
+        users[user_id] = (role, expires)
+
+
+def forget(room_id: int, user_ids=None) -> None:
+    """Drop cached roles for a room, or only for some of its users.
+
+    Runs immediately and again on commit, so a request that read the old
+    memberships before the commit cannot keep them cached.
+    """
+    def drop():
+        global _cache_size
+        with _lock:
+            users = _cache.get(room_id)
+            if not users:
+                return
+            for user_id in (list(users) if user_ids is None else user_ids):
+                if users.pop(user_id, None) is not None:
+                    _cache_size -= 1
+
+    drop()
+    transaction.on_commit(drop)
+
+
+def forget_user(user_id: int) -> None:
+    for room_id in list(_cache):
+        forget(room_id, [user_id])
+
+
+def clear() -> None:
+    global _cache_size
+    with _lock:
+        _cache.clear()
+        _cache_size = 0
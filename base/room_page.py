@@ -0,0 +1,131 @@
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Room, Message, Vote
+from .pagination import KeysetPage, cursor_for, decode_cursor, encode_cursor, keyset_page
+from .pubsub import publish_on_commit
+from .roles import RoomRole
+
+
+MESSAGES_PER_PAGE = 20
+MESSAGE_ORDERING = ['-created', '-id']
+NEW_MESSAGE_ORDERING = ['created', 'id']
+COMMENTS_PER_PAGE = 50
+HIDDEN_PER_PAGE = 20
+SIDEBAR_SIZE = 20
+COMMENT_ORDERING = ['-created', '-id']
+
+
+def visible_messages(room: Room):
+    return room.message_set.filter(hidden_status=False).select_related('author')
+
+
+def message_feed(room: Room, cursor: str | None = None) -> KeysetPage:
+    """Return a page of visible messages, newest first, older than ``cursor``."""
+    return keyset_page(visible_messages(room), MESSAGE_ORDERING, cursor, MESSAGES_PER_PAGE)
+
+
+def new_messages(room: Room, since: str) -> KeysetPage | None:
+    """Return visible messages posted after ``since``, oldest first.
+
+    ``since`` is a cursor from a previous page. None means it is invalid.
+    """
+    if decode_cursor(since, Message, NEW_MESSAGE_ORDERING) is None:
+        return None
+    return keyset_page(visible_messages(room), NEW_MESSAGE_ORDERING, since, MESSAGES_PER_PAGE)
+
+
+def comment_thread(message: Message, cursor: str | None = None) -> KeysetPage:
+    """Return a page of the message's comments with their authors, newest first."""
+    return keyset_page(
+        message.comment_set.select_related('author'), COMMENT_ORDERING, cursor, COMMENTS_PER_PAGE
+    )
+
+
+def latest_cursor(messages, default: str | None = None) -> str:
+    """Cursor of the newest message in ``messages``, for "new since" polling.
+
+    With no messages it falls back to ``default``, or to the current time.
+    """
+    if not messages:
+        return default or encode_cursor([timezone.now(), 0])
+    newest = max(messages, key=lambda message: (message.created, message.id))
+    return cursor_for(newest, NEW_MESSAGE_ORDERING)
+
+
+def room_page_context(room: Room, user, role: RoomRole, hidden_cursor: str | None = None) -> dict:
+    """Collect everything ``room.html`` renders in a fixed number of queries.
+
+    Authors, event and poll creators are joined in, the "already voted" flag
+    is an ``EXISTS`` annotation, and admin-only lists are not queried at all
+    for other members. Every list is evaluated here so the template never
+    goes back to the database, and every list is bounded: events and polls
+    that have not ended, ending soonest first, and a page of hidden messages.
+    """
+    now = timezone.now()
+    room_messages = message_feed(room)
+    room_events = list(
+        room.event_set.filter(expires_at__gt=now).select_related('created_by')
+        .order_by('expires_at', 'id')[:SIDEBAR_SIZE]
+    )
+    room_polls = list(
+        room.poll_set.filter(expires_at__gt=now).select_related('created_by').annotate(
+            has_voted=Exists(Vote.objects.filter(
+                poll_id=OuterRef('id'), user_id=user.id
+            ))
+        ).order_by('expires_at', 'id')[:SIDEBAR_SIZE]
+    )
+
+    hidden_messages, pending_requests = [], []
+    if role.is_admin:
+        hidden_messages = keyset_page(
+            room.message_set.filter(hidden_status=True).select_related('author'),
+            MESSAGE_ORDERING, hidden_cursor, HIDDEN_PER_PAGE
+        )
+        pending_requests = list(room.pending_requests.all())
+
+    return {
+        'room': room,
+        'role': role,
+        'room_messages': room_messages,
+        'latest_cursor': latest_cursor(room_messages.items),
+        'hidden_messages': hidden_messages,
+        'members_count': room.members.count(),
+        'pending_requests': pending_requests,
+        'room_events': room_events,
+        'room_polls': room_polls,
+    }
+
+
+def channel(room_id) -> str:
+    return f'room:{room_id}'
+
+
+def publish(message: Message, event: str, **data):
+    """Push a change to ``message`` to clients watching its room, once committed."""
+    publish_on_commit(channel(message.room_id), {'event': event, 'data': {'id': message.id, **data}})
+
+
+def card_html(message: Message) -> str:
+    return render_to_string('base/message_card.html', {'message': message})
+
+
+def publish_new_message(message: Message):
+    publish(message, 'message', html=card_html(message))
+
+
+def publish_visibility(message: Message):
+    if message.hidden_status:
+        publish(message, 'hidden')
+    else:
+        publish(message, 'unhidden', html=card_html(message))
+
+
+def publish_likes(message: Message):
+    publish(message, 'likes', count=message.like_count)
+
+
+def publish_comment(message: Message):
+    publish(message, 'comment', count=message.comment_count)
+
@@ -0,0 +1,112 @@
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Room
+
+
+FTS_TABLE = 'base_room_fts'
+
+_fts_tables = {}
+
+
+@dataclass
+class SearchPage:
+    rooms: list
+    number: int
+    has_next: bool
+
+    @property
+    def has_previous(self) -> bool:
+        return self.number > 1
+
+    @property
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+    @property
+    def previous_page_number(self) -> int:
+        return self.number - 1
+
+    def __iter__(self):
+        return iter(self.rooms)
+
+    def __len__(self):
+        return len(self.rooms)
+
+
+def fts_available() -> bool:
+    if connection.vendor != 'sqlite':
+        return False
+    key = connection.settings_dict['NAME']
+    if key not in _fts_tables:
+        _fts_tables[key] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[key]
+
+
+def rebuild_index() -> None:
+    """Re-index every room. Use after bulk loads that skip signals."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+            "SELECT id, title, COALESCE(description, '') FROM base_room"
+        )
+
+
+def index_room(room: Room) -> None:
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [room.id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (%s, %s, %s)',
+            [room.id, room.title, room.description or '']
+        )
+
+
+def unindex_room(room_id: int) -> None:
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [room_id])
+
+
+def parse_query(q: str) -> list:
+    return re.findall(r'\w+', q.lower())
+
+
+def search_rooms(q: str, page: int = 1, per_page: int = 5) -> SearchPage:
+    """Return one page of rooms matching ``q``, best matches first.
+
+    Every term is matched as a prefix, so ``"pyth"`` finds ``"python"``.
+    Title hits rank above description hits.
+    """
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    terms = parse_query(q)
+
+    if not terms:
+        rooms = list(Room.objects.select_related('host')[offset:offset + per_page + 1])
+    elif fts_available():
+        match = ' '.join('"%s"*' % term for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s OFFSET %s',
+                [match, per_page + 1, offset]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        found = Room.objects.select_related('host').in_bulk(ids)
+        rooms = [found[room_id] for room_id in ids if room_id in found]
+    else:
+        query = Q()
+        for term in terms:
+            query &= Q(title__icontains=term) | Q(description__icontains=term)
+        rooms = list(Room.objects.select_related('host').filter(query)[offset:offset + per_page + 1])
+
+    return SearchPage(rooms=rooms[:per_page], number=page, has_next=len(rooms) > per_page)
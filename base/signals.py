@@ -0,0 +1,134 @@
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from . import metrics, page_cache, polls, roles, search, sqlite
+from .cards import forget_card
+from .models import Room, Message, Comment, Event, Poll, Vote
+from .pubsub import publish_on_commit
+
+
+connection_created.connect(sqlite.apply_pragmas, dispatch_uid='apply_sqlite_pragmas')
+connection_created.connect(metrics.install_query_timer, dispatch_uid='install_query_timer')
+
+
+@receiver(post_save, sender=Room)
+def index_room(sender, instance, **kwargs):
+    search.index_room(instance)
+
+
+@receiver(post_delete, sender=Room)
+def unindex_room(sender, instance, **kwargs):
+    search.unindex_room(instance.id)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_home_page(sender, instance, **kwargs):
+    page_cache.invalidate('home')
+
+
+def forget_room_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        if pk_set is None:
+            roles.forget_user(instance.id)
+        else:
+            for room_id in pk_set:
+                roles.forget(room_id, [instance.id])
+    else:
+        roles.forget(instance.id, pk_set)
+
+
+for field in roles.ROLE_FIELDS.values():
+    m2m_changed.connect(
+        forget_room_roles,
+        sender=getattr(Room, field).through,
+        dispatch_uid=f'forget_room_roles_{field}'
+    )
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def forget_room(sender, instance, **kwargs):
+    roles.forget(instance.id)
+
+
+@receiver(m2m_changed, sender=Message.likes.through)
+def count_likes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep ``like_count`` right when likes change through the M2M manager.
+
+    ``Message.toggle_like`` writes the through table directly and updates
+    the counter itself, so it does not pass through here.
+    """
+    if action == 'pre_clear' and reverse:
+        instance._cleared_likes = list(instance.liked_messages.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_clear':
+        if not reverse:
+            Message.objects.filter(id=instance.id).update(like_count=0)
+            return
+        message_ids, delta = instance.__dict__.pop('_cleared_likes', []), -1
+    elif reverse:
+        message_ids, delta = pk_set, (1 if action == 'post_add' else -1)
+    else:
+        message_ids, delta = [instance.id], (len(pk_set) if action == 'post_add' else -len(pk_set))
+
+    if message_ids and delta:
+        Message.objects.filter(id__in=message_ids).update(
+            like_count=Greatest(F('like_count') + delta, 0)
+        )
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Message.objects.filter(id=instance.message_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Message.objects.filter(id=instance.message_id).update(comment_count=Greatest(F('comment_count') - 1, 0))
+
+
+@receiver(post_save, sender=Vote)
+def publish_vote(sender, instance, created, **kwargs):
+    if created and instance.choice_id:
+        publish_on_commit(polls.channel(instance.poll_id), {
+            'choice': instance.choice_id, 'delta': 1, 'vote': instance.id
+        })
+
+
+@receiver(post_delete, sender=Vote)
+def publish_unvote(sender, instance, **kwargs):
+    if instance.choice_id:
+        publish_on_commit(polls.channel(instance.poll_id), {
+            'choice': instance.choice_id, 'delta': -1, 'vote': instance.id
+        })
+
+
+CARD_MODELS = {
+    Room: 'room_card',
+    Message: 'message_card',
+    Event: 'event_card',
+    Poll: 'poll_card',
+}
+
+
+def forget_deleted_card(sender, instance, **kwargs):
+    forget_card(CARD_MODELS[sender], instance)
+
+
+for model in CARD_MODELS:
+    post_delete.connect(
+        forget_deleted_card,
+        sender=model,
+        dispatch_uid=f'forget_{model.__name__.lower()}_card'
+    )
+
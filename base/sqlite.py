@@ -0,0 +1,15 @@
+"""Per-connection SQLite tuning, chosen by ``DATABASE_PROFILE``."""
+from django.conf import settings
+
+
+def configure(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """``connection_created`` receiver applying ``SQLITE_PRAGMAS``."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        configure(cursor, settings.SQLITE_PRAGMAS)
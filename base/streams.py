@@ -0,0 +1,106 @@
+"""Server-sent event streams served from the ASGI application."""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import polls, room_page
+from .pubsub import get_broker
+
+
+KEEPALIVE = ': keepalive\n\n'
+
+
+def sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+async def batches(subscription, interval, keepalive):
+    """Yield the messages received, at most one batch every ``interval`` seconds.
+
+    An empty batch is yielded when nothing arrived for ``keepalive`` seconds,
+    so callers can keep idle connections open.
+    """
+    loop = asyncio.get_running_loop()
+    last = None
+    while True:
+        try:
+            first = await subscription.get(keepalive)
+        except TimeoutError:
+            yield []
+            continue
+        if last is not None:
+            wait = last + interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        yield [first, *subscription.drain()]
+        last = loop.time()
+
+
+def tally_event(tallies):
+    return sse('tally', {'choices': tallies, 'total': sum(tallies.values())})
+
+
+async def poll_tallies(poll):
+    """Stream a poll's tallies until voting ends, coalescing votes into one event per interval.
+
+    The subscription opens before the snapshot is read, so votes the
+    snapshot already counts may still arrive; they are recognised by their
+    vote id and skipped.
+    """
+    snapshot = sync_to_async(polls.tally_snapshot)
+    interval = settings.POLL_STREAM_INTERVAL
+    async with get_broker().subscribe(polls.channel(poll.id)) as subscription:
+        tallies, last_vote = await snapshot(poll.id)
+        yield tally_event(tallies)
+        async for messages in batches(subscription, interval, settings.STREAM_KEEPALIVE):
+            if poll.has_ended():
+                break
+            if not messages:
+                yield KEEPALIVE
+                continue
+            if subscription.overflowed or any(m['delta'] < 0 or m['choice'] not in tallies for m in messages):
+                # Missed votes, a withdrawn vote or a new choice: start again from the database.
+                subscription.overflowed = False
+                tallies, last_vote = await snapshot(poll.id)
+            else:
+                votes = [message for message in messages if message['vote'] > last_vote]
+                if not votes:
+                    continue
+                for message in votes:
+                    tallies[message['choice']] += message['delta']
+            yield tally_event(tallies)
+        tallies, _ = await snapshot(poll.id)
+        yield sse('closed', {'choices': tallies})
+
+
+def merge_room_events(messages):
+    """Drop like counts superseded later in the same batch."""
+    last_likes = {m['data']['id']: i for i, m in enumerate(messages) if m['event'] == 'likes'}
+    return [
+        m for i, m in enumerate(messages)
+        if m['event'] != 'likes' or last_likes[m['data']['id']] == i
+    ]
+
+
+async def room_updates(room_id):
+    """Stream changes to a room's message feed as they are committed.
+
+    Each connection is one coroutine waiting on its queue, so idle clients
+    do not hold a thread. A ``reset`` event tells the client that updates
+    were dropped and it should catch up from the feed endpoint.
+    """
+    interval = settings.ROOM_STREAM_INTERVAL
+    async with get_broker().subscribe(room_page.channel(room_id)) as subscription:
+        yield f'retry: {settings.STREAM_RETRY}\n\n'
+        async for messages in batches(subscription, interval, settings.STREAM_KEEPALIVE):
+            if not messages:
+                yield KEEPALIVE
+            elif subscription.overflowed:
+                subscription.overflowed = False
+                subscription.drain()
+                yield sse('reset', {})
+            else:
+                yield ''.join(sse(m['event'], m['data']) for m in merge_room_events(messages))
+
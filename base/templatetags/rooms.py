@@ -0,0 +1,12 @@
+from django import template
+
+from base.roles import get_role
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def room_role(context, room, user=None):
+    """``{% room_role room as role %}`` then ``{% if role.is_admin %}``."""
+    return get_role(user or context['user'], room)
@@ -0,0 +1,97 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from base import archive, notifications
+from base.models import Room, Message, Comment, ArchivedMessage, Notification, Inbox, InboxItem
+
+
+User = get_user_model()
+
+
+@override_settings(NOTIFICATION_DISPATCH='inline')
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.admin = User.objects.create(username='admin')
+        self.member = User.objects.create(username='member')
+        self.room = Room.objects.create(title='Room', host=self.admin)
+        self.room.admins.add(self.admin)
+        self.room.members.add(self.author, self.admin, self.member)
+
+        self.old = self.post('Old', days=400)
+        self.recent = self.post('Recent', days=1)
+        Comment.objects.create(message=self.old, author=self.member, body='First')
+        Comment.objects.create(message=self.old, author=self.admin, body='Second')
+        self.old.toggle_like(self.member)
+        notifications.save_notification(
+            room=self.room, action_by=self.member, message=self.old, action_to=self.author, action_type='l'
+        )
+
+    def post(self, body, days, **fields):
+        message = Message.objects.create(author=self.author, room=self.room, body=body, **fields)
+        Message.objects.filter(id=message.id).update(created=timezone.now() - datetime.timedelta(days=days))
+        message.refresh_from_db()
+        return message
+
+    def test_old_messages_move_to_the_archive(self):
+        self.assertEqual(archive.archive_room(self.room), 1)
+
+        self.assertEqual(list(Message.objects.all()), [self.recent])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Message.likes.through.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(InboxItem.objects.exists())
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_notifications, 0)
+        self.assertEqual(Inbox.objects.get(user=self.admin).unread_admin_notifications, 0)
+
+        archived = ArchivedMessage.objects.get()
+        self.assertEqual((archived.id, archived.created), (self.old.id, self.old.created))
+        content = archive.unpack(archived.payload)
+        self.assertEqual(content['body'], 'Old')
+        self.assertEqual(content['likes'], [self.member.id])
+        self.assertEqual([comment['body'] for comment in content['comments']], ['First', 'Second'])
+        self.assertEqual(content['notifications'][0]['action_by_id'], self.member.id)
+        self.assertEqual(len(content['admin_notifications']), 1)
+
+    def test_retention_is_per_room(self):
+        self.assertEqual(archive.archive_room(self.room, batch_size=1), 1)
+        self.room.retention_days = 0
+        self.room.save()
+        self.assertEqual(archive.archive_room(self.room), 1)
+        self.assertFalse(Message.objects.exists())
+
+    def test_history_pages(self):
+        for i in range(archive.HISTORY_PER_PAGE + 2):
+            self.post(f'Older {i}', days=500 + i)
+        self.post('Hidden', days=450, hidden_status=True)
+        call_command('archive_messages', stdout=StringIO())
+
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('room-history', kwargs={'pk': self.room.id}))
+        history = response.context['history']
+        self.assertEqual([message.content['body'] for message in history][:2], ['Old', 'Older 0'])
+        self.assertContains(response, 'member: First')
+        self.assertNotContains(response, 'Hidden')
+
+        older = self.client.get(reverse('room-history', kwargs={'pk': self.room.id}), {'cursor': history.next_cursor})
+        self.assertEqual(len(older.context['history']), 3)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('room-history', kwargs={'pk': self.room.id}))
+        self.assertContains(response, 'Hidden')
+
+    def test_history_query_count_does_not_grow_with_comments(self):
+        archive.archive_room(self.room)
+        with self.assertNumQueries(2):
+            archive.history_page(self.room)
+
+    def test_history_needs_membership(self):
+        self.client.force_login(User.objects.create(username='outsider'))
+        response = self.client.get(reverse('room-history', kwargs={'pk': self.room.id}))
+        self.assertTemplateUsed(response, 'base/error_page.html')
@@ -0,0 +1,36 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from base.models import Message
+
+
+class BenchmarkViewsTests(TestCase):
+    def test_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_views', '--generate', '--users', '20', '--rooms', '3', '--messages', '50',
+                '--iterations', '2', '--warmup', '1', '--host', 'testserver', '--output', path
+            )
+            with open(path) as file:
+                report = json.load(file)
+
+            err = StringIO()
+            call_command(
+                'benchmark_views', '--iterations', '1', '--warmup', '0', '--host', 'testserver',
+                '--compare', path, stdout=StringIO(), stderr=err
+            )
+
+        results = {result['name']: result for result in report['results']}
+        self.assertTrue({'home_anonymous', 'home', 'room', 'timeline', 'message', 'like', 'comment'} <= set(results))
+        self.assertEqual(report['dataset']['base.Message'], 50)
+        self.assertGreater(results['room']['queries'], 0)
+        self.assertGreater(results['room']['p50_ms'], 0)
+        # Actions are rolled back between iterations.
+        self.assertFalse(Message.objects.filter(comment__body='Benchmark').exists())
+        self.assertIn('room: p50', err.getvalue())
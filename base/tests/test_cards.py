@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from base.cards import CARD_CACHE, card_key
+from base.models import Room, Message
+
+
+User = get_user_model()
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        caches[CARD_CACHE].clear()
+        self.host = User.objects.create(username='host')
+        self.room = Room.objects.create(title='Before', host=self.host)
+        self.message = Message.objects.create(author=self.host, room=self.room, body='Body')
+
+    def render_room(self):
+        room = Room.objects.select_related('host').get(id=self.room.id)
+        return render_to_string('base/room_card.html', {'room': room})
+
+    def test_card_is_served_from_cache_until_saved(self):
+        self.assertIn('Before', self.render_room())
+        # A change that skips save() keeps the version, so the cached card is used.
+        Room.objects.filter(id=self.room.id).update(title='Sneaky')
+        self.assertIn('Before', self.render_room())
+
+        self.room.title = 'After'
+        self.room.save()
+        self.assertIn('After', self.render_room())
+
+    def test_cached_card_needs_no_template_queries(self):
+        message = Message.objects.get(id=self.message.id)
+        render_to_string('base/message_card.html', {'message': message})
+        message = Message.objects.get(id=self.message.id)
+        with self.assertNumQueries(0):
+            render_to_string('base/message_card.html', {'message': message})
+
+    def test_like_count_is_part_of_the_version(self):
+        render_to_string('base/message_card.html', {'message': self.message})
+        self.message.toggle_like(self.host)
+        html = render_to_string('base/message_card.html', {'message': self.message})
+        self.assertIn('1 like<', html)
+
+    def test_delete_drops_the_card(self):
+        self.render_room()
+        room = Room.objects.get(id=self.room.id)
+        key = card_key('room_card', room)
+        self.assertIsNotNone(caches[CARD_CACHE].get(key))
+
+        room.delete()
+        self.assertIsNone(caches[CARD_CACHE].get(key))
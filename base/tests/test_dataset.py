@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Count, Q
+from django.test import TestCase
+
+from base import dataset
+from base.models import Room, Message, Choice, Event, Inbox, InboxItem, Notification, AdminNotification
+from base.notifications import recount
+
+
+class GenerateTests(TestCase):
+    def setUp(self):
+        self.counts = dataset.generate(users=40, rooms=6, messages=300, seed=3, batch_size=64, giant_rooms=1)
+
+    def test_counts_match_the_tables(self):
+        self.assertEqual(self.counts['users'], User.objects.count())
+        self.assertEqual(self.counts['messages'], Message.objects.count())
+        self.assertEqual(self.counts['likes'], Message.likes.through.objects.count())
+        self.assertEqual(self.counts['notifications'], Notification.objects.count())
+        self.assertEqual(self.counts['admin_notifications'], AdminNotification.objects.count())
+
+    def test_same_seed_same_dataset(self):
+        def shape():
+            return list(
+                Message.objects.order_by('id').values_list('room__title', 'body', 'like_count')
+            )[-300:]
+
+        first = shape()
+        dataset.generate(users=40, rooms=6, messages=300, seed=3, batch_size=64, giant_rooms=1)
+        self.assertEqual(first, shape())
+
+    def test_giant_room(self):
+        rooms = Room.objects.annotate(total=Count('message')).order_by('id')
+        giant = rooms.first()
+        self.assertEqual(giant.members.count(), 40)
+        self.assertGreater(giant.total, max(room.total for room in rooms[1:]))
+
+    def test_counters_agree_with_rows(self):
+        for message in Message.objects.annotate(like_total=Count('likes', distinct=True), comment_total=Count('comment', distinct=True)):
+            self.assertEqual((message.like_count, message.comment_count), (message.like_total, message.comment_total))
+        for choice in Choice.objects.annotate(total=Count('vote')):
+            self.assertEqual(choice.votes, choice.total)
+        for event in Event.objects.annotate(total=Count('rsvps', filter=Q(rsvps__status='a'))):
+            self.assertEqual(event.accepted_count, event.total)
+        for inbox in Inbox.objects.select_related('user'):
+            unread = (inbox.unread_notifications, inbox.unread_admin_notifications)
+            fresh = recount(inbox.user)
+            self.assertEqual(unread, (fresh.unread_notifications, fresh.unread_admin_notifications))
+
+    def test_history_is_spread_out(self):
+        messages = Message.objects.order_by('created')
+        self.assertGreater(messages.last().created - messages.first().created, dataset.datetime.timedelta(days=300))
+        self.assertTrue(InboxItem.objects.filter(read_status=True).exists())
+        self.assertTrue(InboxItem.objects.filter(read_status=False).exists())
+
+
+class GenerateDatasetCommandTests(TestCase):
+    def test_command(self):
+        out = StringIO()
+        call_command('generate_dataset', '--users', '10', '--rooms', '2', '--messages', '20', stdout=out)
+        self.assertEqual(Message.objects.count(), 20)
+        self.assertIn('messages: 20', out.getvalue())
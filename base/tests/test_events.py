@@ -0,0 +1,55 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from base.models import Room, Event, Rsvp
+
+
+User = get_user_model()
+
+
+class RsvpTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.room = Room.objects.create(title='Room', host=self.host)
+        self.room.members.add(self.host)
+        self.event = Event.objects.create(
+            title='Event',
+            created_by=self.host,
+            room=self.room,
+            starts_at=timezone.now() + datetime.timedelta(days=1),
+            expires_at=timezone.now() + datetime.timedelta(days=2)
+        )
+
+    def test_answers_are_counted_once(self):
+        guests = [User.objects.create(username=f'guest{i}') for i in range(3)]
+        self.assertTrue(self.event.respond(guests[0], 'a'))
+        self.assertTrue(self.event.respond(guests[1], 'a'))
+        self.assertTrue(self.event.respond(guests[2], 'r'))
+        self.assertFalse(self.event.respond(guests[0], 'r'))
+        self.assertFalse(self.event.respond(guests[0], 'a'))
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.accepted_count, self.event.rejected_count), (2, 1))
+        self.assertEqual(self.event.rsvp_status(guests[0]), 'a')
+        self.assertIsNone(self.event.rsvp_status(self.host))
+        self.assertEqual(Rsvp.objects.count(), 3)
+
+    def test_answer_is_an_insert_and_a_counter_update(self):
+        # Savepoint, INSERT, UPDATE, release.
+        with self.assertNumQueries(4):
+            self.event.respond(self.host, 'a')
+
+    def test_event_page_shows_counts_and_answer(self):
+        for i in range(5):
+            self.event.respond(User.objects.create(username=f'guest{i}'), 'a')
+        self.event.respond(self.host, 'r')
+        self.client.force_login(self.host)
+        response = self.client.get(reverse('event', kwargs={'pk': self.event.id}))
+
+        self.assertEqual(response.context['rsvp_status'], 'r')
+        self.assertContains(response, '5 accepted, 1 rejected')
+        self.assertContains(response, 'Already rejected')
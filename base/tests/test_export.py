@@ -0,0 +1,124 @@
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from base import archive, export
+from base.models import Room, Message, Comment, Poll, Choice, Event
+
+
+User = get_user_model()
+
+
+def parse(data):
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.admin = User.objects.create(username='admin')
+        self.member = User.objects.create(username='member')
+        self.room = Room.objects.create(title='Room', host=self.admin)
+        self.room.admins.add(self.admin)
+        self.room.members.add(self.admin, self.member)
+
+        old = Message.objects.create(author=self.member, room=self.room, body='Old')
+        Comment.objects.create(message=old, author=self.admin, body='Old comment')
+        old.toggle_like(self.admin)
+        Message.objects.filter(id=old.id).update(created=now - datetime.timedelta(days=500))
+        archive.archive_room(self.room)
+
+        self.message = Message.objects.create(author=self.member, room=self.room, body='Hello')
+        Comment.objects.create(message=self.message, author=self.admin, body='Welcome')
+        self.message.toggle_like(self.admin)
+
+        poll = Poll.objects.create(question='Lunch?', room=self.room, created_by=self.admin,
+                                   starts_at=now, expires_at=now + datetime.timedelta(days=1))
+        choice = Choice.objects.create(poll=poll, text='Yes')
+        Choice.objects.create(poll=poll, text='No')
+        poll.cast_vote(self.member, choice)
+
+        event = Event.objects.create(title='Meetup', room=self.room, created_by=self.admin,
+                                     starts_at=now, expires_at=now + datetime.timedelta(days=1))
+        event.respond(self.member, 'a')
+
+    def download(self, **params):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export-room', kwargs={'pk': self.room.id}), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_export_contents(self):
+        response, data = self.download()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn(f'room-{self.room.id}.jsonl', response['Content-Disposition'])
+
+        room, archived, live, poll, event = parse(data)
+        self.assertEqual((room['type'], room['host']), ('room', 'admin'))
+        self.assertEqual((archived['body'], archived['archived']), ('Old', True))
+        self.assertEqual(archived['likes'], ['admin'])
+        self.assertEqual(archived['comments'][0]['author'], 'admin')
+        self.assertEqual((live['body'], live['archived'], live['likes']), ('Hello', False, ['admin']))
+        self.assertEqual(live['comments'][0]['body'], 'Welcome')
+        self.assertEqual(poll['choices'], [{'text': 'Yes', 'votes': 1}, {'text': 'No', 'votes': 0}])
+        self.assertEqual((event['accepted'], event['rejected']), (['member'], []))
+
+    def test_gzip(self):
+        _, plain = self.download()
+        response, data = self.download(compress='gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(data), plain)
+
+    def test_only_admins_can_export(self):
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('export-room', kwargs={'pk': self.room.id}))
+        self.assertTemplateUsed(response, 'base/error_page.html')
+
+    @override_settings(EXPORT_CHUNK_SIZE=1)
+    def test_chunks_end_on_lines(self):
+        chunks = list(export.stream(self.room))
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(all(chunk.endswith(b'\n') for chunk in chunks))
+
+    def test_queries_are_per_batch_not_per_row(self):
+        def count():
+            with CaptureQueriesContext(connection) as queries:
+                for _ in export.records(self.room, batch_size=100):
+                    pass
+            return len(queries)
+
+        few = count()
+        for i in range(20):
+            message = Message.objects.create(author=self.member, room=self.room, body=f'More {i}')
+            Comment.objects.create(message=message, author=self.admin, body='Again')
+            message.toggle_like(self.member)
+        self.assertEqual(count(), few)
+
+    async def test_asgi_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('export-room', kwargs={'pk': self.room.id}))
+        self.assertTrue(response.is_async)
+        data = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(parse(data)), 5)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_room', str(self.room.id), stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'room.jsonl.gz')
+            call_command('export_room', str(self.room.id), '--gzip', '--output', path)
+            with gzip.open(path, 'rb') as file:
+                self.assertEqual(file.read().decode(), out.getvalue())
@@ -0,0 +1,76 @@
+import re
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from base import metrics
+from base.models import Room, Message
+
+
+def sample(text, name, **labels):
+    label = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}{{{re.escape(label)}}} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.user = User.objects.create(username='metrics')
+        self.room = Room.objects.create(host=self.user, title='Room')
+        self.room.members.add(self.user)
+        Message.objects.create(room=self.room, author=self.user, body='Hello')
+        self.client.force_login(self.user)
+
+    def scrape(self, **extra):
+        response = self.client.get(reverse('metrics'), **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_records_per_view(self):
+        self.client.get(reverse('room', args=[self.room.id]))
+        self.client.get(reverse('room', args=[self.room.id]))
+        text = self.scrape()
+
+        self.assertEqual(sample(text, 'django_request_duration_seconds_count', view='room'), 2)
+        self.assertEqual(sample(text, 'django_request_queries_count', view='room'), 2)
+        self.assertGreater(sample(text, 'django_request_queries_sum', view='room'), 2)
+        self.assertEqual(sample(text, 'django_responses_total', view='room', status=200), 2)
+        self.assertGreater(sample(text, 'django_request_sql_seconds_sum', view='room'), 0)
+        self.assertGreater(sample(text, 'django_request_template_seconds_sum', view='room'), 0)
+        self.assertEqual(sample(text, 'django_request_duration_seconds_bucket', view='room', le='+Inf'), 2)
+        self.assertIn('# TYPE django_request_duration_seconds histogram', text)
+
+    async def test_async_requests(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.get(reverse('room', args=[self.room.id]))
+        text = metrics.registry.exposition()
+        self.assertEqual(sample(text, 'django_request_duration_seconds_count', view='room'), 1)
+        self.assertGreater(sample(text, 'django_request_queries_sum', view='room'), 2)
+
+    def test_unmatched_urls_share_one_series(self):
+        self.client.get('/no-such-page/')
+        self.client.get('/nor-this/')
+        text = self.scrape()
+        self.assertEqual(sample(text, 'django_responses_total', view='unmatched', status=404), 2)
+
+    def test_queries_outside_requests_are_not_counted(self):
+        Room.objects.count()
+        self.assertIsNone(sample(self.scrape(), 'django_request_queries_count', view='room'))
+
+    def test_buckets_are_cumulative(self):
+        histogram = metrics.Histogram((1, 5))
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.scrape(HTTP_AUTHORIZATION='Bearer s3cret')
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_remote_addresses_need_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
@@ -0,0 +1,340 @@
+import re
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from base import notifications
+from base.models import Room, Message, Notification, AdminNotification, Inbox, InboxItem, NotificationEvent
+
+
+User = get_user_model()
+
+
+@override_settings(NOTIFICATION_DISPATCH='inline')
+class InboxTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.liker = User.objects.create(username='liker')
+        self.admin1 = User.objects.create(username='admin1')
+        self.admin2 = User.objects.create(username='admin2')
+
+        self.room = Room.objects.create(title='Room', host=self.admin1)
+        self.room.admins.add(self.admin1, self.admin2)
+        self.room.members.add(self.author, self.liker, self.admin1, self.admin2)
+
+        self.message = Message.objects.create(author=self.author, room=self.room, body='Body')
+
+    def notify(self, action_type='l', action_by=None):
+        notifications.save_notification(
+            room=self.room,
+            action_by=action_by or self.liker,
+            message=self.message,
+            action_to=self.author,
+            action_type=action_type
+        )
+
+    def test_save_notification_fans_out_to_recipient_and_admins(self):
+        self.notify('l')
+        self.notify('c')
+
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_notifications, 2)
+        for admin in (self.admin1, self.admin2):
+            self.assertEqual(Inbox.objects.get(user=admin).unread_admin_notifications, 2)
+        self.assertEqual(len(notifications.unread_notifications(self.author)), 2)
+        self.assertEqual(len(notifications.unread_admin_notifications(self.admin2)), 2)
+
+    def test_marking_read_updates_items_and_counters(self):
+        self.notify()
+        notifications.mark_notification_read(Notification.objects.get())
+        notifications.mark_admin_notification_read(AdminNotification.objects.get())
+
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_total, 0)
+        self.assertEqual(Inbox.objects.get(user=self.admin1).unread_total, 0)
+        self.assertEqual(Inbox.objects.get(user=self.admin2).unread_total, 0)
+        self.assertFalse(InboxItem.objects.filter(read_status=False).exists())
+
+    def test_marking_read_twice_does_not_double_count(self):
+        self.notify('l')
+        self.notify('c')
+        notification = Notification.objects.first()
+        notifications.mark_notification_read(notification)
+        notifications.mark_notification_read(notification)
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_notifications, 1)
+
+    def test_get_inbox_recounts_missing_counters(self):
+        self.notify()
+        Inbox.objects.all().delete()
+        self.assertEqual(notifications.get_inbox(self.admin1).unread_admin_notifications, 1)
+
+    def test_home_reads_admin_notifications_from_inbox(self):
+        self.notify()
+        self.client.force_login(self.admin2)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['admin_notifications'], [AdminNotification.objects.get()])
+        self.assertContains(response, 'Notifications (1)')
+
+    def test_likes_on_one_message_are_coalesced(self):
+        others = [User.objects.create(username=f'other{i}') for i in range(3)]
+        for user in [self.liker, *others]:
+            self.notify('l', user)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 4)
+        self.assertEqual(notification.action_by, others[-1])
+        self.assertEqual(AdminNotification.objects.get().actor_count, 4)
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_notifications, 1)
+        self.assertEqual(InboxItem.objects.count(), 3)
+
+    def test_repeat_comments_by_the_same_user_count_once(self):
+        self.notify('c')
+        self.notify('c')
+        self.assertEqual(Notification.objects.get().actor_count, 1)
+
+    def test_returning_commenter_is_counted_once(self):
+        self.notify('c', self.liker)
+        self.notify('c', self.admin1)
+        self.notify('c', self.liker)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.action_by, self.liker)
+        self.assertEqual(AdminNotification.objects.get().actor_count, 2)
+
+    def test_retract_after_returning_actor(self):
+        self.notify('l', self.liker)
+        self.notify('l', self.admin1)
+        self.notify('l', self.liker)
+        notifications.retract_notification(
+            room=self.room,
+            action_by=self.liker,
+            message=self.message,
+            action_to=self.author,
+            action_type='l'
+        )
+
+        notification = Notification.objects.get()
+        self.assertEqual((notification.actor_count, notification.action_by), (1, self.admin1))
+
+    def test_retract_by_an_uncounted_actor_is_ignored(self):
+        self.notify('l', self.liker)
+        notifications.retract_notification(
+            room=self.room,
+            action_by=self.admin1,
+            message=self.message,
+            action_to=self.author,
+            action_type='l'
+        )
+        self.assertEqual(Notification.objects.get().actor_count, 1)
+
+    def test_one_unread_aggregate_per_message(self):
+        self.notify('l')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Notification.objects.create(
+                action_by=self.admin1, action_to=self.author, room=self.room, message=self.message, action_type='l'
+            )
+
+    def test_conflicting_insert_is_replayed(self):
+        bulk_create = Notification.objects.bulk_create
+        calls = []
+
+        def racing(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 1:
+                raise IntegrityError('UNIQUE constraint failed')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', racing):
+            self.notify('l')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Notification.objects.get().actors, [self.liker.id])
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_notifications, 1)
+
+    def test_read_aggregate_starts_a_new_one(self):
+        self.notify('l')
+        notifications.mark_all_read(self.author)
+        self.notify('l', self.admin1)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_notifications, 1)
+
+    def test_unlike_retracts_the_like(self):
+        self.message.likes.add(self.liker)
+        self.notify('l')
+        self.message.likes.remove(self.liker)
+        notifications.retract_notification(
+            room=self.room,
+            action_by=self.liker,
+            message=self.message,
+            action_to=self.author,
+            action_type='l'
+        )
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(AdminNotification.objects.exists())
+        self.assertEqual(Inbox.objects.get(user=self.author).unread_total, 0)
+        self.assertEqual(Inbox.objects.get(user=self.admin1).unread_total, 0)
+
+    def test_unlike_by_latest_actor_hands_over_to_previous_liker(self):
+        self.message.likes.add(self.admin1)
+        self.notify('l', self.admin1)
+        self.message.likes.add(self.liker)
+        self.notify('l', self.liker)
+
+        self.client.force_login(self.liker)
+        self.client.post(reverse('message', kwargs={'pk': self.message.id}), {'like_submit': 'like_submit'})
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 1)
+        self.assertEqual(notification.action_by, self.admin1)
+
+
+@override_settings(NOTIFICATION_DISPATCH='inline')
+class BulkMarkReadTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.liker = User.objects.create(username='liker')
+        self.admin1 = User.objects.create(username='admin1')
+        self.admin2 = User.objects.create(username='admin2')
+
+        self.room1 = Room.objects.create(title='Room 1', host=self.admin1)
+        self.room2 = Room.objects.create(title='Room 2', host=self.admin1)
+        for room in (self.room1, self.room2):
+            room.admins.add(self.admin1, self.admin2)
+            room.members.add(self.author, self.liker)
+            for _ in range(3):
+                message = Message.objects.create(author=self.author, room=room, body='Body')
+                notifications.save_notification(
+                    room=room,
+                    action_by=self.liker,
+                    message=message,
+                    action_to=self.author,
+                    action_type='c'
+                )
+
+    def test_mark_all_read_uses_one_update_per_model(self):
+        with self.assertNumQueries(9):
+            counts = notifications.mark_all_read(self.author)
+        self.assertEqual(counts.unread_total, 0)
+        self.assertFalse(Notification.objects.filter(read_status=False).exists())
+        self.assertTrue(AdminNotification.objects.filter(read_status=False).exists())
+
+    def test_admin_read_is_shared_with_other_admins(self):
+        counts = notifications.mark_all_read(self.admin1)
+        self.assertEqual(counts.unread_admin_notifications, 0)
+        self.assertEqual(notifications.get_inbox(self.admin2).unread_admin_notifications, 0)
+        self.assertEqual(notifications.get_inbox(self.author).unread_notifications, 6)
+
+    def test_mark_read_up_to_id(self):
+        third = Notification.objects.order_by('id')[2]
+        counts = notifications.mark_read_up_to(self.author, notification_id=third.id)
+        self.assertEqual(counts.unread_notifications, 3)
+        self.assertEqual(Notification.objects.filter(read_status=True, id__gt=third.id).count(), 0)
+
+    def test_mark_shown_read_leaves_the_rest_unread(self):
+        for _ in range(notifications.INBOX_SIZE):
+            message = Message.objects.create(author=self.author, room=self.room1, body='Body')
+            notifications.save_notification(
+                room=self.room1, action_by=self.liker, message=message, action_to=self.author, action_type='l'
+            )
+        self.client.force_login(self.author)
+        page = self.client.get(reverse('home')).content.decode()
+        form = re.search(r'value="shown">(.*?)</form>', page, re.DOTALL).group(1)
+        shown = re.findall(r'name="notification_id" value="(\d+)"', form)
+        self.assertEqual(len(shown), notifications.INBOX_SIZE)
+
+        self.client.post(reverse('read-notifications'), {'scope': 'shown', 'notification_id': shown})
+        self.assertEqual(set(Notification.objects.filter(read_status=True).values_list('id', flat=True)),
+                         {int(pk) for pk in shown})
+        self.assertEqual(notifications.get_inbox(self.author).unread_notifications, 6)
+
+    def test_mark_room_read(self):
+        counts = notifications.mark_room_read(self.admin2, self.room1)
+        self.assertEqual(counts.unread_admin_notifications, 3)
+        self.assertFalse(AdminNotification.objects.filter(room=self.room1, read_status=False).exists())
+
+    def test_bulk_read_ignores_notifications_owned_by_others(self):
+        notifications.mark_all_read(self.liker)
+        self.assertEqual(Notification.objects.filter(read_status=True).count(), 0)
+        self.assertEqual(AdminNotification.objects.filter(read_status=True).count(), 0)
+
+    def test_read_notifications_view_returns_counts(self):
+        self.client.force_login(self.author)
+        response = self.client.post(reverse('read-notifications'),
+                                    {'scope': 'room', 'room_id': self.room2.id},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'unread_notifications': 3, 'unread_admin_notifications': 0})
+
+        response = self.client.post(reverse('read-notifications'), {'scope': 'all'})
+        self.assertRedirects(response, reverse('home'))
+        self.assertEqual(notifications.get_inbox(self.author).unread_total, 0)
+
+
+@override_settings(NOTIFICATION_DISPATCH='outbox')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.admin = User.objects.create(username='admin')
+        self.likers = [User.objects.create(username=f'liker{i}') for i in range(20)]
+
+        self.room = Room.objects.create(title='Room', host=self.admin)
+        self.room.admins.add(self.admin)
+        self.messages = [
+            Message.objects.create(author=self.author, room=self.room, body=f'Body {i}')
+            for i in range(3)
+        ]
+
+    def act(self, message, user, notify=notifications.save_notification):
+        notify(
+            room=self.room,
+            action_by=user,
+            message=message,
+            action_to=self.author,
+            action_type='l'
+        )
+
+    def dispatch(self, **options):
+        call_command('dispatch_notifications', once=True, stdout=StringIO(), **options)
+
+    def test_request_only_records_an_event(self):
+        with self.assertNumQueries(1):
+            self.act(self.messages[0], self.likers[0])
+        self.assertEqual(NotificationEvent.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_worker_coalesces_a_batch(self):
+        for message in self.messages:
+            for user in self.likers:
+                self.act(message, user)
+
+        # Independent of the batch size; four of these are the savepoints
+        # each model's fold runs in.
+        with self.assertNumQueries(21):
+            notifications.drain(batch_size=100)
+
+        self.assertFalse(NotificationEvent.objects.exists())
+        self.assertEqual(
+            list(Notification.objects.values_list('actor_count', flat=True)), [20, 20, 20]
+        )
+        self.assertEqual(AdminNotification.objects.count(), 3)
+        self.assertEqual(notifications.get_inbox(self.author).unread_notifications, 3)
+        self.assertEqual(notifications.get_inbox(self.admin).unread_admin_notifications, 3)
+
+    def test_small_batches_give_the_same_result(self):
+        for user in self.likers:
+            self.act(self.messages[0], user)
+        self.dispatch(batch_size=7)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 20)
+        self.assertEqual(notification.action_by, self.likers[-1])
+
+    def test_like_and_unlike_in_one_batch_cancel_out(self):
+        self.act(self.messages[0], self.likers[0])
+        self.act(self.messages[0], self.likers[0], notify=notifications.retract_notification)
+        self.dispatch()
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(InboxItem.objects.exists())
+        self.assertEqual(notifications.get_inbox(self.author).unread_total, 0)
+
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from base import page_cache
+from base.models import Room
+
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_LOCK_WAIT=0.1)
+class AnonymousHomeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.host = User.objects.create(username='host')
+        self.room = Room.objects.create(title='Landing room', host=self.host)
+        self.url = reverse('home')
+
+    def test_repeat_visit_skips_the_database(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+
+    def test_query_strings_are_cached_separately(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, {'q': 'nothing-matches'})
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'value="nothing-matches"')
+
+    def test_room_changes_invalidate(self):
+        self.client.get(self.url)
+        self.room.title = 'Renamed room'
+        self.room.save()
+        self.assertContains(self.client.get(self.url), 'Renamed room')
+
+        Room.objects.get(id=self.room.id).delete()
+        self.assertNotContains(self.client.get(self.url), 'Renamed room')
+
+    def test_signed_in_users_are_not_served_the_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(self.host)
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Logout')
+
+    def test_concurrent_miss_is_served_the_stale_copy(self):
+        self.client.get(self.url)
+        page_cache.invalidate('home')
+        request = self.client.get(self.url).wsgi_request
+        _, stale_key, lock_key = page_cache.page_keys('home', request)
+        page_cache.invalidate('home')
+
+        # Another request is rendering the page.
+        cache.add(lock_key, True)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Landing room')
+
+        cache.delete(stale_key)
+        self.assertIsNotNone(self.client.get(self.url).context)
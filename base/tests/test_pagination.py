@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from base.models import Room
+from base.pagination import keyset_page, encode_cursor
+from base.views import ROOM_ORDERING
+
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.member = User.objects.create(username='member')
+        self.rooms = [
+            Room.objects.create(title=f'Room {i}', host=self.host)
+            for i in range(25)
+        ]
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Room.objects.all(), ROOM_ORDERING, cursor, per_page=10)
+            seen.extend(page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, list(reversed(self.rooms)))
+
+    def test_invalid_cursor_returns_first_page(self):
+        first = keyset_page(Room.objects.all(), ROOM_ORDERING, None, per_page=5)
+        for cursor in ('garbage', encode_cursor(['x', 'y'])):
+            page = keyset_page(Room.objects.all(), ROOM_ORDERING, cursor, per_page=5)
+            self.assertEqual(page.items, first.items)
+
+    def test_home_renders_a_bounded_page_with_hosts_joined(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['open_rooms']), 10)
+        self.assertTrue(response.context['open_rooms'].has_next)
+
+    def test_load_more_returns_following_page(self):
+        first = self.client.get(reverse('home')).context['open_rooms']
+        response = self.client.get(reverse('room-list', kwargs={'kind': 'open'}),
+                                   {'cursor': first.next_cursor})
+        self.assertTemplateUsed(response, 'base/room_cards.html')
+        self.assertEqual(list(response.context['rooms']), list(reversed(self.rooms))[10:20])
+
+    def test_my_rooms_requires_login(self):
+        response = self.client.get(reverse('room-list', kwargs={'kind': 'mine'}))
+        self.assertRedirects(response, reverse('login'))
+
+        self.rooms[0].members.add(self.member)
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('room-list', kwargs={'kind': 'mine'}))
+        self.assertEqual(list(response.context['rooms']), [self.rooms[0]])
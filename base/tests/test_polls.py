@@ -0,0 +1,84 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from base.models import Room, Poll, Choice, Vote
+from base.polls import tally
+
+
+User = get_user_model()
+
+
+class VoteLedgerTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.room = Room.objects.create(title='Room', host=self.host)
+        self.room.members.add(self.host)
+        self.poll = Poll.objects.create(
+            question='Question',
+            room=self.room,
+            created_by=self.host,
+            starts_at=timezone.now(),
+            expires_at=timezone.now() + datetime.timedelta(days=1)
+        )
+        self.yes = Choice.objects.create(text='Yes', poll=self.poll)
+        self.no = Choice.objects.create(text='No', poll=self.poll)
+
+    def test_second_vote_is_rejected(self):
+        self.assertTrue(self.poll.cast_vote(self.host, self.yes))
+        self.assertFalse(self.poll.cast_vote(self.host, self.no))
+
+        self.yes.refresh_from_db()
+        self.no.refresh_from_db()
+        self.assertEqual((self.yes.votes, self.no.votes), (1, 0))
+        self.assertTrue(self.poll.voted_by(self.host))
+        self.assertEqual(Vote.objects.get().choice, self.yes)
+
+    def test_vote_is_an_insert_and_a_counter_update(self):
+        # Savepoint, INSERT, UPDATE, release.
+        with self.assertNumQueries(4):
+            self.poll.cast_vote(self.host, self.yes)
+
+    def test_vote_view_records_in_ledger(self):
+        self.client.force_login(self.host)
+        self.client.post(reverse('poll', kwargs={'pk': self.poll.id}), {'vote': 'vote', 'choice': self.no.id})
+        response = self.client.post(reverse('poll', kwargs={'pk': self.poll.id}), {'vote': 'vote', 'choice': self.yes.id})
+
+        self.assertEqual(response.context['error_message'], 'You already voted on this poll')
+        self.assertEqual(list(Vote.objects.values_list('choice', flat=True)), [self.no.id])
+
+    def test_tally_repairs_drifted_counters(self):
+        voters = [User.objects.create(username=f'voter{i}') for i in range(3)]
+        for user in voters:
+            self.poll.cast_vote(user, self.yes)
+        Choice.objects.filter(id=self.yes.id).update(votes=7)
+        Choice.objects.filter(id=self.no.id).update(votes=2)
+
+        self.assertEqual(tally([self.poll.id]), 2)
+        self.yes.refresh_from_db()
+        self.no.refresh_from_db()
+        self.assertEqual((self.yes.votes, self.no.votes), (3, 0))
+        self.assertEqual(tally([self.poll.id]), 0)
+
+    def test_tally_skips_polls_with_votes_missing_a_choice(self):
+        self.poll.voted_users.add(self.host)
+        Choice.objects.filter(id=self.yes.id).update(votes=1)
+
+        self.assertEqual(tally([self.poll.id]), 0)
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.votes, 1)
+
+    def test_tally_votes_command(self):
+        self.poll.cast_vote(self.host, self.yes)
+        Choice.objects.filter(id=self.yes.id).update(votes=0)
+        out = StringIO()
+        call_command('tally_votes', '--batch-size', '1', stdout=out)
+
+        self.assertIn('corrected 1 choices', out.getvalue())
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.votes, 1)
@@ -0,0 +1,128 @@
+import datetime
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from base import notifications
+from base.room_page import latest_cursor
+from base.models import Room, Message, Comment, Event, Poll, Choice
+
+
+User = get_user_model()
+
+# A bare "SCAN <table>" reads every row. Scans that walk an index (for
+# ORDER BY ... LIMIT or a covering COUNT), FTS lookups, constant rows and
+# materialised subqueries are fine.
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW|\()(?!.*\b(INDEX|VIRTUAL TABLE)\b)')
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class QueryPlanTests(TestCase):
+    """Fail when a statement issued by a view is planned as a full table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='member')
+        cls.other = User.objects.create(username='other')
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        for i in range(3):
+            Room.objects.create(title=f'Other room {i}', host=cls.other, open_status=i % 2 == 0)
+        cls.room = Room.objects.create(title='Room', host=cls.user)
+        cls.room.admins.add(cls.user)
+        cls.room.members.add(cls.user, cls.other)
+        cls.message = Message.objects.create(room=cls.room, author=cls.other, body='Body')
+        Comment.objects.create(message=cls.message, author=cls.user, body='Comment')
+        cls.event = Event.objects.create(title='Event', room=cls.room, created_by=cls.user,
+                                         starts_at=now + day, expires_at=now + 2 * day)
+        cls.poll = Poll.objects.create(question='Poll', room=cls.room, created_by=cls.user,
+                                       starts_at=now - day, expires_at=now + day)
+        cls.choice = Choice.objects.create(poll=cls.poll, text='Yes')
+        notifications.save_notification(room=cls.room, action_by=cls.user, action_to=cls.other,
+                                        message=cls.message, action_type='c')
+        notifications.save_notification(room=cls.room, action_by=cls.other, action_to=cls.user,
+                                        message=cls.message, action_type='l')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def full_scans(self, queries):
+        found = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith(EXPLAINABLE):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for row in cursor.fetchall():
+                    if FULL_SCAN.match(row[3]):
+                        found.append(f'{row[3]}\n    {sql}')
+        return found
+
+    def assertNoFullScans(self, url, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            if data is None:
+                response = self.client.get(url)
+            else:
+                response = self.client.post(url, data)
+        self.assertLess(response.status_code, 400)
+        scans = self.full_scans(captured.captured_queries)
+        self.assertFalse(scans, 'Full table scans:\n' + '\n'.join(scans))
+
+    def test_home(self):
+        self.assertNoFullScans(reverse('home'))
+        self.assertNoFullScans(reverse('home') + '?q=room')
+
+    def test_anonymous_home(self):
+        self.client.logout()
+        self.assertNoFullScans(reverse('home') + '?page=2')
+
+    def test_room_lists(self):
+        for kind in ('mine', 'open', 'closed'):
+            self.assertNoFullScans(reverse('room-list', kwargs={'kind': kind}))
+
+    def test_room(self):
+        self.assertNoFullScans(reverse('room', kwargs={'pk': self.room.id}))
+
+    def test_room_messages(self):
+        url = reverse('room-messages', kwargs={'pk': self.room.id})
+        self.assertNoFullScans(url)
+        self.assertNoFullScans(f'{url}?since={latest_cursor([self.message])}')
+
+    def test_room_history(self):
+        self.assertNoFullScans(reverse('room-history', kwargs={'pk': self.room.id}))
+
+    def test_message(self):
+        url = reverse('message', kwargs={'pk': self.message.id})
+        self.assertNoFullScans(url)
+        self.assertNoFullScans(url, {'like_submit': ''})
+        self.assertNoFullScans(url, {'comment_submit': '', 'body': 'Another'})
+        self.assertNoFullScans(url, {'hide_submit': ''})
+
+    def test_event(self):
+        url = reverse('event', kwargs={'pk': self.event.id})
+        self.assertNoFullScans(url)
+        self.assertNoFullScans(url, {'accepted': ''})
+
+    def test_poll(self):
+        url = reverse('poll', kwargs={'pk': self.poll.id})
+        self.assertNoFullScans(url)
+        self.assertNoFullScans(url, {'vote': '', 'choice': self.choice.id})
+
+    def test_timeline(self):
+        self.assertNoFullScans(reverse('timeline'))
+
+    def test_user_profile(self):
+        self.assertNoFullScans(reverse('user-profile', kwargs={'pk': self.other.id}))
+
+    def test_read_notifications(self):
+        url = reverse('read-notifications')
+        self.assertNoFullScans(url, {'scope': 'room', 'room_id': self.room.id})
+        self.assertNoFullScans(url, {'scope': 'all'})
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from base import roles
+from base.models import Room
+
+
+User = get_user_model()
+
+
+class RoomRoleTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.member = User.objects.create(username='member')
+        self.outsider = User.objects.create(username='outsider')
+
+        self.room = Room.objects.create(title='Room', host=self.host)
+        self.room.admins.add(self.host)
+        self.room.members.add(self.host, self.member)
+
+    def test_role_is_resolved_with_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            role = roles.get_role(self.member, self.room)
+        with self.assertNumQueries(0):
+            self.assertIs(roles.get_role(self.member, self.room.id), role)
+        self.assertEqual(role.name, 'member')
+        self.assertTrue(role.can_post)
+
+    def test_roles(self):
+        self.room.suspended_members.add(self.member)
+        self.room.pending_requests.add(self.outsider)
+
+        host = roles.get_role(self.host, self.room)
+        self.assertTrue(host.is_host and host.is_admin and host.is_member)
+        self.assertEqual(roles.get_role(self.member, self.room).name, 'suspended')
+        self.assertFalse(roles.get_role(self.member, self.room).can_post)
+        self.assertEqual(roles.get_role(self.outsider, self.room).name, 'pending')
+
+    def test_membership_changes_invalidate_the_cache(self):
+        self.assertFalse(roles.get_role(self.outsider, self.room).is_member)
+        self.room.members.add(self.outsider)
+        self.assertTrue(roles.get_role(self.outsider, self.room).is_member)
+
+        self.outsider.member_rooms.remove(self.room)
+        self.assertFalse(roles.get_role(self.outsider, self.room).is_member)
+
+        self.assertTrue(roles.get_role(self.member, self.room).is_member)
+        self.room.members.clear()
+        self.assertFalse(roles.get_role(self.member, self.room).is_member)
+
+    @override_settings(ROOM_ROLE_CACHE_TTL=0)
+    def test_entries_expire(self):
+        roles.get_role(self.member, self.room)
+        with self.assertNumQueries(1):
+            roles.get_role(self.member, self.room)
+
+    def test_template_tag(self):
+        template = Template('{% load rooms %}{% room_role room as role %}{{ role.name }}')
+        self.assertEqual(template.render(Context({'room': self.room, 'user': self.host})), 'host')
@@ -0,0 +1,276 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from base.models import Room, Message, Comment, Event, Poll
+from base.room_page import COMMENTS_PER_PAGE, HIDDEN_PER_PAGE, SIDEBAR_SIZE
+
+
+User = get_user_model()
+
+
+class RoomPageQueryCountTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin')
+        self.member = User.objects.create(username='member')
+        self.room = Room.objects.create(title='Room', host=self.admin)
+        self.room.admins.add(self.admin)
+        self.room.members.add(self.admin, self.member)
+        self.room.pending_requests.add(User.objects.create(username='pending'))
+
+    def add_content(self, count):
+        now = timezone.now()
+        for i in range(count):
+            author = User.objects.create(username=f'author{Message.objects.count()}')
+            Message.objects.create(author=author, room=self.room, body='Body')
+            Message.objects.create(author=author, room=self.room, body='Hidden', hidden_status=True)
+            Event.objects.create(
+                title='Event', created_by=author, room=self.room,
+                starts_at=now + datetime.timedelta(days=1),
+                expires_at=now + datetime.timedelta(days=2)
+            )
+            poll = Poll.objects.create(
+                question='Poll', created_by=author, room=self.room,
+                starts_at=now, expires_at=now + datetime.timedelta(days=1)
+            )
+            poll.voted_users.add(self.member, self.admin)
+
+    def count_queries(self, user):
+        self.client.force_login(user)
+        # Warm the role cache and create the inbox row before measuring.
+        self.client.get(reverse('room', kwargs={'pk': self.room.id}))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('room', kwargs={'pk': self.room.id}))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_room_content(self):
+        for user in (self.admin, self.member):
+            self.add_content(2)
+            small = self.count_queries(user)
+            self.add_content(20)
+            self.assertEqual(self.count_queries(user), small)
+
+    def test_members_skip_admin_only_queries(self):
+        self.add_content(1)
+        self.assertLess(self.count_queries(self.member), self.count_queries(self.admin))
+
+    def test_voted_flag_is_per_user(self):
+        self.add_content(1)
+        Poll.objects.create(
+            question='Unvoted', created_by=self.admin, room=self.room,
+            starts_at=timezone.now(), expires_at=timezone.now() + datetime.timedelta(days=1)
+        )
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('room', kwargs={'pk': self.room.id}))
+        flags = {poll.question: poll.has_voted for poll in response.context['room_polls']}
+        self.assertEqual(flags, {'Poll': True, 'Unvoted': False})
+
+    def test_lists_are_bounded(self):
+        self.add_content(SIDEBAR_SIZE + 1)
+        past = timezone.now() - datetime.timedelta(days=1)
+        Event.objects.create(title='Ended', created_by=self.admin, room=self.room,
+                             starts_at=past - datetime.timedelta(days=1), expires_at=past)
+        Poll.objects.create(question='Closed', created_by=self.admin, room=self.room,
+                            starts_at=past - datetime.timedelta(days=1), expires_at=past)
+
+        self.client.force_login(self.admin)
+        url = reverse('room', kwargs={'pk': self.room.id})
+        context = self.client.get(url).context
+        self.assertEqual(len(context['room_events']), SIDEBAR_SIZE)
+        self.assertEqual(len(context['room_polls']), SIDEBAR_SIZE)
+        self.assertNotIn('Ended', [event.title for event in context['room_events']])
+        self.assertNotIn('Closed', [poll.question for poll in context['room_polls']])
+
+        hidden = context['hidden_messages']
+        self.assertEqual(len(hidden), HIDDEN_PER_PAGE)
+        older = self.client.get(url, {'hidden_cursor': hidden.next_cursor}).context['hidden_messages']
+        self.assertEqual(len(older), SIDEBAR_SIZE + 1 - HIDDEN_PER_PAGE)
+        self.assertFalse(older.has_next)
+
+
+class MessageFeedTests(TestCase):
+    def setUp(self):
+        self.member = User.objects.create(username='member')
+        self.outsider = User.objects.create(username='outsider')
+        self.room = Room.objects.create(title='Room', host=self.member)
+        self.room.members.add(self.member)
+        self.messages = [
+            Message.objects.create(author=self.member, room=self.room, body=f'Message {i}')
+            for i in range(45)
+        ]
+        Message.objects.create(author=self.member, room=self.room, body='Hidden', hidden_status=True)
+        self.client.force_login(self.member)
+
+    def test_room_renders_only_the_first_page(self):
+        response = self.client.get(reverse('room', kwargs={'pk': self.room.id}))
+        page = response.context['room_messages']
+        self.assertEqual(page.items, self.messages[::-1][:20])
+        self.assertContains(response, 'Load older messages')
+
+    def test_older_pages_follow_the_cursor(self):
+        seen = []
+        page = self.client.get(reverse('room', kwargs={'pk': self.room.id})).context['room_messages']
+        seen.extend(page.items)
+        while page.has_next:
+            response = self.client.get(reverse('room-messages', kwargs={'pk': self.room.id}),
+                                       {'cursor': page.next_cursor})
+            page = response.context['room_messages']
+            seen.extend(page.items)
+        self.assertEqual(seen, self.messages[::-1])
+
+    def test_new_since_cursor_returns_only_fresh_messages(self):
+        cursor = self.client.get(reverse('room', kwargs={'pk': self.room.id})).context['latest_cursor']
+        url = reverse('room-messages', kwargs={'pk': self.room.id})
+
+        data = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual(data['count'], 0)
+        self.assertEqual(data['latest_cursor'], cursor)
+
+        fresh = Message.objects.create(author=self.member, room=self.room, body='Fresh message')
+        data = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual(data['count'], 1)
+        self.assertIn('Fresh message', data['html'])
+        self.assertEqual(self.client.get(url, {'since': data['latest_cursor']}).json()['count'], 0)
+
+    def test_feed_requires_membership_and_a_valid_cursor(self):
+        url = reverse('room-messages', kwargs={'pk': self.room.id})
+        self.assertEqual(self.client.get(url, {'since': 'nonsense'}).status_code, 400)
+
+        self.client.force_login(self.outsider)
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'base/error_page.html')
+
+
+class LikeToggleTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.room = Room.objects.create(title='Room', host=self.author)
+        self.room.members.add(self.author)
+        self.message = Message.objects.create(author=self.author, room=self.room, body='Body')
+
+    def test_toggle_keeps_like_count_in_step(self):
+        likers = [User.objects.create(username=f'liker{i}') for i in range(3)]
+        for user in likers:
+            self.assertTrue(self.message.toggle_like(user))
+        self.assertFalse(self.message.toggle_like(likers[0]))
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.like_count, 2)
+        self.assertEqual(self.message.likes.count(), 2)
+        self.assertFalse(self.message.is_liked_by(likers[0]))
+        self.assertTrue(self.message.is_liked_by(likers[1]))
+
+    def test_toggle_cost_does_not_depend_on_like_count(self):
+        for i in range(30):
+            self.message.toggle_like(User.objects.create(username=f'liker{i}'))
+
+        def statements():
+            with CaptureQueriesContext(connection) as queries:
+                self.message.toggle_like(self.author)
+            return [
+                query['sql'].split()[0] for query in queries
+                if not query['sql'].startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK'))
+            ]
+
+        self.assertEqual(statements(), ['INSERT', 'UPDATE'])
+        self.assertEqual(statements(), ['INSERT', 'DELETE', 'UPDATE'])
+
+    def test_unlike_with_a_drifted_counter(self):
+        self.message.toggle_like(self.author)
+        Message.objects.filter(id=self.message.id).update(like_count=0)
+        self.message.refresh_from_db()
+        self.assertFalse(self.message.toggle_like(self.author))
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.like_count, 0)
+
+    def test_message_page_reads_the_counter(self):
+        self.message.toggle_like(self.author)
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('message', kwargs={'pk': self.message.id}))
+        self.assertEqual(response.context['likes_count'], 1)
+        self.assertTrue(response.context['liked'])
+        self.assertContains(response, 'Unlike message')
+
+    def test_manager_changes_update_the_counter(self):
+        likers = [User.objects.create(username=f'liker{i}') for i in range(3)]
+        self.message.likes.add(*likers)
+        likers[0].liked_messages.remove(self.message)
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.like_count, 2)
+
+        likers[1].liked_messages.clear()
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.like_count, 1)
+
+        self.message.likes.clear()
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.like_count, 0)
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.room = Room.objects.create(title='Room', host=self.author)
+        self.room.members.add(self.author)
+        self.message = Message.objects.create(author=self.author, room=self.room, body='Body')
+
+    def add_comments(self, count):
+        for i in range(count):
+            commenter = User.objects.create(username=f'commenter{Comment.objects.count()}')
+            Comment.objects.create(message=self.message, author=commenter, body=f'Comment {i}')
+
+    def view(self, cursor=None):
+        self.client.force_login(self.author)
+        url = reverse('message', kwargs={'pk': self.message.id})
+        return self.client.get(url, {'cursor': cursor} if cursor else {})
+
+    def test_comment_count_follows_creates_and_deletes(self):
+        self.add_comments(3)
+        Comment.objects.filter(message=self.message).first().delete()
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.comment_count, 2)
+
+        self.message.comment_set.all().delete()
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.comment_count, 0)
+
+    def test_posting_a_comment_updates_the_count(self):
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('message', kwargs={'pk': self.message.id}), {'comment_submit': '', 'body': 'Hi'}
+        )
+        self.assertEqual(self.view().context['comments_count'], 1)
+
+    def test_query_count_does_not_grow_with_comments(self):
+        self.add_comments(3)
+        self.view()
+        with CaptureQueriesContext(connection) as few:
+            self.view()
+        self.add_comments(COMMENTS_PER_PAGE)
+        with CaptureQueriesContext(connection) as many:
+            response = self.view()
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(response.context['comments_count'], COMMENTS_PER_PAGE + 3)
+
+    def test_pages_follow_the_cursor(self):
+        self.add_comments(COMMENTS_PER_PAGE + 5)
+        first = self.view().context['comments']
+        self.assertEqual(len(first), COMMENTS_PER_PAGE)
+        self.assertTrue(first.has_next)
+        self.assertEqual(first.items[0].body, f'Comment {COMMENTS_PER_PAGE + 4}')
+
+        second = self.view(first.next_cursor).context['comments']
+        self.assertEqual([comment.body for comment in second], [f'Comment {i}' for i in range(4, -1, -1)])
+        self.assertFalse(second.has_next)
+
+    def test_card_shows_the_count(self):
+        self.add_comments(2)
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('room', kwargs={'pk': self.room.id}))
+        self.assertContains(response, '2 comments')
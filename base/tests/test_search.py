@@ -0,0 +1,48 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from base import search
+from base.models import Room
+
+
+class RoomSearchTests(TestCase):
+    def setUp(self):
+        self.python_room = Room.objects.create(
+            title='Python study group',
+            description='Weekly meetups'
+        )
+        self.django_room = Room.objects.create(
+            title='Web frameworks',
+            description='Django, Flask and some python'
+        )
+        self.other_room = Room.objects.create(
+            title='Knitting',
+            description='Yarn and needles'
+        )
+
+    def test_title_match_ranks_above_description_match(self):
+        rooms = search.search_rooms('python').rooms
+        self.assertEqual(rooms, [self.python_room, self.django_room])
+
+    def test_terms_match_as_prefixes(self):
+        rooms = search.search_rooms('pyth stud').rooms
+        self.assertEqual(rooms, [self.python_room])
+
+    def test_index_follows_room_updates_and_deletes(self):
+        self.other_room.title = 'Python knitting'
+        self.other_room.save()
+        self.assertIn(self.other_room, search.search_rooms('python').rooms)
+
+        self.other_room.delete()
+        self.assertEqual(len(search.search_rooms('knitting')), 0)
+
+    def test_results_are_paginated(self):
+        first = search.search_rooms('python', page=1, per_page=1)
+        second = search.search_rooms('python', page=2, per_page=1)
+        self.assertTrue(first.has_next)
+        self.assertFalse(second.has_next)
+        self.assertEqual(first.rooms + second.rooms, [self.python_room, self.django_room])
+
+    def test_home_uses_search_index(self):
+        response = self.client.get(reverse('home'), {'q': 'knit'})
+        self.assertEqual(list(response.context['search_rooms']), [self.other_room])
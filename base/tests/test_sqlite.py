@@ -0,0 +1,55 @@
+import json
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from base import sqlite
+
+
+class SqliteProfileTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_production_pragmas_are_applied(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+            sqlite.configure(database.cursor(), settings.SQLITE_PROFILES['production'])
+
+            def pragma(name):
+                return database.execute(f'PRAGMA {name}').fetchone()[0]
+
+            self.assertEqual(pragma('journal_mode'), 'wal')
+            self.assertEqual(pragma('synchronous'), 1)
+            self.assertEqual(pragma('busy_timeout'), 5000)
+            self.assertEqual(pragma('cache_size'), -64000)
+            database.close()
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_connection_created_hook(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            previous = cursor.fetchone()[0]
+        try:
+            sqlite.apply_pragmas(sender=None, connection=connection)
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 1234)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA busy_timeout = {previous}')
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', '--profile', 'production', '--workers', '2',
+            '--duration', '0.2', '--rows', '100', '--json', stdout=out
+        )
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['profile'], 'production')
+        self.assertGreater(result['reads'] + result['writes'], 0)
+        self.assertEqual(result['locked'], 0)
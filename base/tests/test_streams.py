@@ -0,0 +1,257 @@
+import asyncio
+import datetime
+import json
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from base import polls, room_page, streams
+from base.models import Room, Message, Poll, Choice, Vote
+from base.pubsub import LocalBroker, get_broker
+
+
+User = get_user_model()
+
+
+def parse(event):
+    name, data = event.strip().split('\n')
+    return name.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+
+def published(test, channel, action, count=1):
+    """Run ``action`` and return the first ``count`` messages it published on ``channel``."""
+    ready = threading.Event()
+    received = []
+
+    async def listen():
+        async with get_broker().subscribe(channel) as subscription:
+            ready.set()
+            while len(received) < count:
+                received.append(await subscription.get(5))
+
+    thread = threading.Thread(target=asyncio.run, args=(listen(),))
+    thread.start()
+    ready.wait(5)
+    with test.captureOnCommitCallbacks(execute=True):
+        action()
+    thread.join()
+    return received
+
+
+class LocalBrokerTests(SimpleTestCase):
+    async def test_publish_from_another_thread(self):
+        broker = LocalBroker()
+        async with broker.subscribe('room:1') as subscription:
+            thread = threading.Thread(target=broker.publish, args=('room:1', {'n': 1}))
+            thread.start()
+            thread.join()
+            self.assertEqual(await subscription.get(1), {'n': 1})
+            self.assertEqual(broker.publish('room:2', {'n': 2}), 0)
+        self.assertEqual(broker.subscriber_count('room:1'), 0)
+
+    async def test_full_queue_marks_overflow(self):
+        broker = LocalBroker(queue_size=2)
+        async with broker.subscribe('room:1') as subscription:
+            for n in range(3):
+                broker.publish('room:1', n)
+            await asyncio.sleep(0)
+            self.assertEqual(subscription.drain(), [0, 1])
+            self.assertTrue(subscription.overflowed)
+
+    async def test_batches_are_coalesced(self):
+        broker = LocalBroker()
+        async with broker.subscribe('room:1') as subscription:
+            received = streams.batches(subscription, interval=0.05, keepalive=1)
+            broker.publish('room:1', 0)
+            self.assertEqual(await anext(received), [0])
+            for n in range(1, 6):
+                broker.publish('room:1', n)
+            self.assertEqual(await anext(received), [1, 2, 3, 4, 5])
+
+    async def test_idle_stream_yields_empty_batch(self):
+        async with LocalBroker().subscribe('room:1') as subscription:
+            received = streams.batches(subscription, interval=0.05, keepalive=0.01)
+            self.assertEqual(await anext(received), [])
+
+
+@override_settings(POLL_STREAM_INTERVAL=0.05)
+class PollStreamTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.room = Room.objects.create(title='Room', host=self.host)
+        self.room.members.add(self.host)
+        self.poll = Poll.objects.create(
+            question='Question',
+            room=self.room,
+            created_by=self.host,
+            starts_at=timezone.now(),
+            expires_at=timezone.now() + datetime.timedelta(days=1)
+        )
+        self.yes = Choice.objects.create(text='Yes', poll=self.poll, votes=2)
+        self.no = Choice.objects.create(text='No', poll=self.poll)
+
+    async def test_votes_are_pushed_as_one_tally(self):
+        events = streams.poll_tallies(self.poll)
+        self.assertEqual(parse(await anext(events)), ('tally', {'choices': {str(self.yes.id): 2, str(self.no.id): 0}, 'total': 2}))
+
+        channel = polls.channel(self.poll.id)
+        get_broker().publish(channel, {'choice': self.yes.id, 'delta': 1, 'vote': 1})
+        self.assertEqual(parse(await anext(events))[1]['total'], 3)
+        for vote in range(2, 6):
+            get_broker().publish(channel, {'choice': self.no.id, 'delta': 1, 'vote': vote})
+        name, data = parse(await anext(events))
+        self.assertEqual(data['choices'], {str(self.yes.id): 3, str(self.no.id): 4})
+        await events.aclose()
+
+    @override_settings(STREAM_KEEPALIVE=0.01)
+    async def test_stream_closes_when_the_poll_ends(self):
+        events = streams.poll_tallies(self.poll)
+        await anext(events)
+        self.poll.expires_at = timezone.now() - datetime.timedelta(seconds=1)
+        self.assertEqual(parse(await anext(events)), ('closed', {'choices': {str(self.yes.id): 2, str(self.no.id): 0}}))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+
+    def test_vote_is_published_on_commit(self):
+        voter = User.objects.create(username='voter')
+        messages = published(self, polls.channel(self.poll.id), lambda: self.poll.cast_vote(voter, self.no))
+        self.assertEqual(messages, [{'choice': self.no.id, 'delta': 1, 'vote': Vote.objects.get().id}])
+
+    async def test_vote_published_before_the_snapshot_counts_once(self):
+        channel = polls.channel(self.poll.id)
+        early, late = await User.objects.acreate(username='early'), await User.objects.acreate(username='late')
+        snapshot = polls.tally_snapshot
+
+        def vote_then_read(poll_id):
+            self.poll.cast_vote(early, self.yes)
+            get_broker().publish(channel, {'choice': self.yes.id, 'delta': 1, 'vote': Vote.objects.get().id})
+            return snapshot(poll_id)
+
+        with mock.patch.object(polls, 'tally_snapshot', vote_then_read):
+            events = streams.poll_tallies(self.poll)
+            self.assertEqual(parse(await anext(events))[1]['total'], 3)
+
+        await sync_to_async(self.poll.cast_vote)(late, self.no)
+        vote = await Vote.objects.aget(user=late)
+        get_broker().publish(channel, {'choice': self.no.id, 'delta': 1, 'vote': vote.id})
+        self.assertEqual(parse(await anext(events))[1]['choices'], {str(self.yes.id): 3, str(self.no.id): 1})
+        await events.aclose()
+
+    async def test_withdrawn_vote_reloads_the_tallies(self):
+        events = streams.poll_tallies(self.poll)
+        await anext(events)
+        await Choice.objects.filter(id=self.yes.id).aupdate(votes=1)
+        get_broker().publish(polls.channel(self.poll.id), {'choice': self.yes.id, 'delta': -1, 'vote': 1})
+        self.assertEqual(parse(await anext(events))[1]['total'], 1)
+        await events.aclose()
+
+    async def test_stream_view(self):
+        outsider = await User.objects.acreate(username='outsider')
+        url = reverse('poll-stream', kwargs={'pk': self.poll.id})
+
+        await self.async_client.aforce_login(outsider)
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+
+        await self.async_client.aforce_login(self.host)
+        opened = []
+        poll_tallies = streams.poll_tallies
+
+        def tallies(poll):
+            opened.append(poll_tallies(poll))
+            return opened[-1]
+
+        with mock.patch.object(streams, 'poll_tallies', tallies):
+            response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = aiter(response.streaming_content)
+        self.assertEqual(parse((await anext(content)).decode())[0], 'tally')
+        await content.aclose()
+        await opened[0].aclose()
+
+        page = await self.async_client.get(reverse('poll', kwargs={'pk': self.poll.id}))
+        self.assertContains(page, f'data-stream-url="{url}"')
+
+    def test_stream_view_needs_asgi(self):
+        self.client.force_login(self.host)
+        response = self.client.get(reverse('poll-stream', kwargs={'pk': self.poll.id}))
+        self.assertEqual(response.status_code, 204)
+        response = self.client.get(reverse('poll', kwargs={'pk': self.poll.id}))
+        self.assertContains(response, 'id="poll-tally"')
+        self.assertNotContains(response, 'data-stream-url')
+
+
+@override_settings(ROOM_STREAM_INTERVAL=0.05)
+class RoomStreamTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create(username='host')
+        self.room = Room.objects.create(title='Room', host=self.host)
+        self.room.admins.add(self.host)
+        self.room.members.add(self.host)
+        self.message = Message.objects.create(author=self.host, room=self.room, body='Body')
+        self.channel = room_page.channel(self.room.id)
+        self.client.force_login(self.host)
+
+    def test_new_message_pushes_its_card(self):
+        [pushed] = published(self, self.channel, lambda: self.client.post(
+            reverse('create-message', kwargs={'pk': self.room.id}), {'title': 'Hello', 'body': 'World'}
+        ))
+        message = Message.objects.latest('id')
+        self.assertEqual(pushed['event'], 'message')
+        self.assertEqual(pushed['data']['id'], message.id)
+        self.assertIn(f'data-message-id="{message.id}"', pushed['data']['html'])
+
+    def test_message_actions_push_deltas(self):
+        url = reverse('message', kwargs={'pk': self.message.id})
+        pushed = published(self, self.channel, lambda: [
+            self.client.post(url, {'like_submit': ''}),
+            self.client.post(url, {'comment_submit': '', 'body': 'Nice'}),
+            self.client.post(url, {'hide_submit': ''}),
+        ], count=3)
+        self.assertEqual([(m['event'], m['data']['id']) for m in pushed], [
+            ('likes', self.message.id), ('comment', self.message.id), ('hidden', self.message.id)
+        ])
+        self.assertEqual(pushed[0]['data']['count'], 1)
+
+    async def test_stream_sends_batches_of_deltas(self):
+        events = streams.room_updates(self.room.id)
+        self.assertEqual(await anext(events), 'retry: 3000\n\n')
+
+        broker = get_broker()
+        broker.publish(self.channel, {'event': 'hidden', 'data': {'id': 1}})
+        self.assertEqual(parse(await anext(events)), ('hidden', {'id': 1}))
+        for count in range(1, 4):
+            broker.publish(self.channel, {'event': 'likes', 'data': {'id': 2, 'count': count}})
+        broker.publish(self.channel, {'event': 'comment', 'data': {'id': 2}})
+        chunk = await anext(events)
+        self.assertEqual([parse(event) for event in chunk.strip().split('\n\n')], [
+            ('likes', {'id': 2, 'count': 3}), ('comment', {'id': 2})
+        ])
+        await events.aclose()
+
+    async def test_stream_view_requires_membership(self):
+        outsider = await User.objects.acreate(username='outsider')
+        url = reverse('room-stream', kwargs={'pk': self.room.id})
+
+        await self.async_client.aforce_login(outsider)
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+
+        await self.async_client.aforce_login(self.host)
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        await response.streaming_content.aclose()
+
+        page = await self.async_client.get(reverse('room', kwargs={'pk': self.room.id}))
+        self.assertContains(page, f'data-stream-url="{url}"')
+
+    def test_stream_view_needs_asgi(self):
+        response = self.client.get(reverse('room-stream', kwargs={'pk': self.room.id}))
+        self.assertEqual(response.status_code, 204)
+        response = self.client.get(reverse('room', kwargs={'pk': self.room.id}))
+        self.assertContains(response, 'data-feed-url')
+        self.assertNotContains(response, 'data-stream-url')
+
@@ -0,0 +1,57 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from base import timeline
+from base.models import Room, Event, Poll
+
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='member')
+        self.now = timezone.now()
+        day = datetime.timedelta(days=1)
+        self.rooms = [Room.objects.create(title=f'Room {i}', host=self.user) for i in range(3)]
+        for room in self.rooms[:2]:
+            room.members.add(self.user)
+
+        def event(title, room, starts, ends):
+            return Event.objects.create(title=title, room=room, created_by=self.user,
+                                        starts_at=self.now + starts * day, expires_at=self.now + ends * day)
+
+        def poll(question, room, starts, ends):
+            return Poll.objects.create(question=question, room=room, created_by=self.user,
+                                       starts_at=self.now + starts * day, expires_at=self.now + ends * day)
+
+        event('Upcoming', self.rooms[1], 2, 3)
+        event('Ongoing', self.rooms[0], -1, 1)
+        event('Ended', self.rooms[0], -3, -2)
+        event('Elsewhere', self.rooms[2], 1, 2)
+        self.voted = poll('Voted', self.rooms[1], -1, 1)
+        poll('Closing soon', self.rooms[0], -1, 0.5)
+        poll('Not started', self.rooms[0], 1, 2)
+        poll('Closed', self.rooms[1], -2, -1)
+        poll('Elsewhere', self.rooms[2], -1, 1)
+        self.voted.voted_users.add(self.user)
+
+    def test_only_live_items_from_member_rooms(self):
+        events = timeline.live_events(self.user, self.now)
+        polls = timeline.open_polls(self.user, self.now)
+
+        self.assertEqual([event.title for event in events], ['Ongoing', 'Upcoming'])
+        self.assertEqual([(poll.question, poll.has_voted) for poll in polls], [('Closing soon', False), ('Voted', True)])
+
+    def test_timeline_page_query_count(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('timeline'))
+        # Session, user, inbox, events and polls.
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('timeline'))
+        self.assertContains(response, 'Ongoing, ends')
+        self.assertContains(response, 'Already voted')
@@ -799,7 +799,7 @@ class EventDetailViewTests(TestCase):
             expires_at=datetime.timedelta(days=-1) + timezone.now()
         )
 
-        self.test_event1.accepted.add(*[test_user1])
+        self.test_event1.respond(test_user1, 'a')
         self.test_event1.save()
         self.test_event2.save()
     def test_deny_non_member_request(self):
@@ -0,0 +1,37 @@
+"""What is happening across all of a user's rooms."""
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Room, Event, Poll, Vote
+
+
+TIMELINE_SIZE = 20
+
+
+def member_rooms(user):
+    return Room.members.through.objects.filter(user_id=user.id).values('room_id')
+
+
+def live_events(user, now=None, limit=TIMELINE_SIZE):
+    """Upcoming and ongoing events in ``user``'s rooms, soonest first.
+
+    Each room's events are read from the (room, expires_at) index, so ended
+    events are never fetched.
+    """
+    now = now or timezone.now()
+    return list(
+        Event.objects.filter(room_id__in=member_rooms(user), expires_at__gt=now)
+        .select_related('room', 'created_by')
+        .order_by('starts_at', 'id')[:limit]
+    )
+
+
+def open_polls(user, now=None, limit=TIMELINE_SIZE):
+    """Polls accepting votes in ``user``'s rooms, closing soonest first."""
+    now = now or timezone.now()
+    return list(
+        Poll.objects.filter(room_id__in=member_rooms(user), starts_at__lte=now, expires_at__gt=now)
+        .select_related('room', 'created_by')
+        .annotate(has_voted=Exists(Vote.objects.filter(poll_id=OuterRef('id'), user_id=user.id)))
+        .order_by('expires_at', 'id')[:limit]
+    )
@@ -9,7 +9,14 @@ urlpatterns = [
     path('update-user', views.update_user, name='update-user'),
     path('register/', views.register_page, name='register'),
 
+    path('rooms/<str:kind>/', views.room_list, name='room-list'),
+    path('timeline/', views.timeline, name='timeline'),
+    path('notifications/read/', views.read_notifications, name='read-notifications'),
     path('room/<str:pk>/', views.room, name='room'),
+    path('room/<str:pk>/messages/', views.room_messages, name='room-messages'),
+    path('room/<str:pk>/stream/', views.room_stream, name='room-stream'),
+    path('room/<str:pk>/history/', views.room_history, name='room-history'),
+    path('room/<str:pk>/export/', views.export_room, name='export-room'),
     path('create-room/', views.create_room, name='create-room'),
     path('update-room/str:pk/', views.update_room, name='update-room'),
     path('delete-room/<str:pk>/', views.delete_room, name='delete-room'),
@@ -20,9 +27,12 @@ urlpatterns = [
 
     path('create-poll/<str:pk>/', views.create_poll, name='create-poll'),
     path('poll/<str:pk>/', views.poll, name='poll'),
+    path('poll/<str:pk>/stream/', views.poll_stream, name='poll-stream'),
     path('create-choice/<str:pk>/', views.create_choice, name='create-choice'),
 
     path('event/<str:pk>/', views.event, name='event'),
     path('create-event/<str:pk>/', views.create_event, name='create-event'),
-    path('user-profile/<str:pk>/', views.user_profile, name='user-profile')
+    path('user-profile/<str:pk>/', views.user_profile, name='user-profile'),
+
+    path('metrics', views.metrics, name='metrics'),
 ]
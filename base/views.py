@@ -1,50 +1,59 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import logout, login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db.models import F, Q
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render, redirect
-
-
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import require_POST
+
+
+from . import notifications as inbox
+from . import archive, export, search, streams, timeline as user_timeline
+from . import metrics as request_metrics
+from .page_cache import cache_anonymous_page
+from .pagination import keyset_page
+from .roles import get_role
+from .room_page import room_page_context, message_feed, new_messages, latest_cursor, comment_thread
+from .room_page import publish_new_message, publish_visibility, publish_likes, publish_comment
 from .forms import RoomForm, CommentForm, MessageForm, PollForm, EventForm, ChoiceForm
 from .models import Room, Message, Comment, Event, Choice, Poll, Notification, AdminNotification
+from .notifications import save_notification, retract_notification
 
 # Create your views here.
 
-def save_notification(
-                      room: Room,
-                      action_by: User,
-                      message: Message,
-                      action_to: User,
-                      action_type: str,
-                      ) -> None:
-    user_notification = Notification(
-        action_by=action_by,
-        action_to=action_to,
-        room=room,
-        message=message,
-        action_type=action_type
-    )
-    admin_notification = AdminNotification(
-        action_by=action_by,
-        action_to=action_to,
-        room=room,
-        message=message,
-        action_type=action_type
-    )
-
-    user_notification.save()
-    admin_notification.save()
+ROOMS_PER_PAGE = 10
+ROOM_ORDERING = ['-updated', '-created', '-id']
+
+def room_list_queryset(user, kind: str):
+    rooms = Room.objects.select_related('host')
+    if kind == 'mine':
+        return rooms.filter(members=user)
+    if user.is_authenticated:
+        rooms = rooms.exclude(members=user)
+    return rooms.filter(open_status=(kind == 'open'))
+
+
+def room_list_page(user, kind: str, cursor: str | None = None):
+    return keyset_page(room_list_queryset(user, kind), ROOM_ORDERING, cursor, ROOMS_PER_PAGE)
 
+
+@cache_anonymous_page('home')
 def home(request):
     my_rooms, admin_notifications, notifications = [], [], []
 
     if not request.user.is_authenticated:
-        open_rooms = Room.objects.filter(open_status=True)
-        closed_rooms = Room.objects.filter(open_status=False)
+        open_rooms = room_list_page(request.user, 'open')
+        closed_rooms = room_list_page(request.user, 'closed')
     else:
         if request.method == 'POST':
             if 'read-notification' in request.POST:
@@ -53,40 +62,88 @@ def home(request):
                     error = 'Cannot process this request. not owner'
                     return render(request, "base/error_page.html", {'error': error})
                 else:
-                    notification.read_status = True
-                    notification.save()
+                    inbox.mark_notification_read(notification)
                     return redirect('home')
             if 'read-admin-notification' in request.POST:
                 admin_notification = AdminNotification.objects.get(id=request.POST.get('admin_notification_id'))
-                if request.user not in admin_notification.room.admins.all():
+                if not get_role(request.user, admin_notification.room_id).is_admin:
                     error = 'Cannot process this request, not owner'
                     return render(request, "base/error_page.html", {'error': error})
                 else:
-                    admin_notification.read_status = True
-                    admin_notification.save()
+                    inbox.mark_admin_notification_read(admin_notification)
                     return redirect('home')
-        my_rooms = Room.objects.filter(members=request.user)
-        open_rooms = Room.objects.exclude(members=request.user).filter(open_status=True)
-        closed_rooms = Room.objects.exclude(members=request.user).filter(open_status=False)
-        notifications = Notification.objects.filter(action_to=request.user, read_status=False)
-        admin_notifications = AdminNotification.objects.filter(room__admins=request.user, read_status=False)
+        my_rooms = room_list_page(request.user, 'mine')
+        open_rooms = room_list_page(request.user, 'open')
+        closed_rooms = room_list_page(request.user, 'closed')
+        notifications = inbox.unread_notifications(request.user)
+        admin_notifications = inbox.unread_admin_notifications(request.user)
     rooms_count = Room.objects.all().count()
     q = request.GET.get('q') if request.GET.get('q') != None else ''
-    search_rooms = Room.objects.filter(
-        Q(title__icontains=q) |
-        Q(description__icontains=q)
-    )[0:5]
+    try:
+        search_page = int(request.GET.get('page', 1))
+    except ValueError:
+        search_page = 1
+    search_rooms = search.search_rooms(q, page=search_page)
     context = {
         'my_rooms': my_rooms,
         'open_rooms': open_rooms,
         'closed_rooms': closed_rooms,
         'rooms_count': rooms_count,
         'search_rooms': search_rooms,
+        'q': q,
         'notifications': notifications,
         'admin_notifications': admin_notifications
     }
     return render(request, 'base/home.html', context)
 
+def room_list(request, kind):
+    if kind not in ('mine', 'open', 'closed'):
+        error = 'Unknown room list'
+        return render(request, 'base/error_page.html', {'error': error})
+    if kind == 'mine' and not request.user.is_authenticated:
+        return redirect('login')
+
+    rooms = room_list_page(request.user, kind, request.GET.get('cursor'))
+    context = {'rooms': rooms, 'kind': kind}
+    return render(request, 'base/room_cards.html', context)
+
+@login_required(login_url='login')
+@require_POST
+def read_notifications(request):
+    scope = request.POST.get('scope')
+    try:
+        if scope == 'all':
+            counts = inbox.mark_all_read(request.user)
+        elif scope == 'up-to':
+            notification_id = request.POST.get('notification_id')
+            admin_notification_id = request.POST.get('admin_notification_id')
+            counts = inbox.mark_read_up_to(
+                request.user,
+                int(notification_id) if notification_id else None,
+                int(admin_notification_id) if admin_notification_id else None
+            )
+        elif scope == 'shown':
+            counts = inbox.mark_shown_read(
+                request.user,
+                [int(pk) for pk in request.POST.getlist('notification_id')],
+                [int(pk) for pk in request.POST.getlist('admin_notification_id')]
+            )
+        elif scope == 'room':
+            room = get_object_or_404(Room, id=request.POST.get('room_id'))
+            counts = inbox.mark_room_read(request.user, room)
+        else:
+            raise ValueError(scope)
+    except ValueError:
+        error = 'Cannot process this request, invalid read scope'
+        return render(request, 'base/error_page.html', {'error': error})
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({
+            'unread_notifications': counts.unread_notifications,
+            'unread_admin_notifications': counts.unread_admin_notifications
+        })
+    return redirect('home')
+
 def login_page(request):
     page = 'login'
     if request.user.is_authenticated:
@@ -163,12 +220,13 @@ def update_room(request, pk):
 def room(request, pk):
     room = get_object_or_404(Room, id=pk)
 
-    if request.user not in room.members.all():
+    role = get_role(request.user, room)
+    if not role.is_member:
         error = 'Not a member of this room'
         return render(request, 'base/error_page.html', {'error': error})
 
     if request.method == 'POST':
-        if request.user not in room.admins.all():
+        if not role.is_admin:
             error = 'Not an admin of this room'
             return render(request, 'base/error_page.html', {'error': error})
 
@@ -183,37 +241,104 @@ def room(request, pk):
         room.save()
         return redirect('room', pk=room.id)
 
-    room_messages = room.message_set.filter(hidden_status=False)
-    hidden_messages = room.message_set.filter(hidden_status=True)
-    members = room.members.all()
-    members_count = members.count()
-    pending_requests = room.pending_requests.all()
-    suspended_members = room.suspended_members.all()
-    room_events = room.event_set.all()
-    room_polls = room.poll_set.all()
+    context = room_page_context(room, request.user, role, request.GET.get('hidden_cursor'))
+    return render(request, 'base/room.html', context)
 
-    context = {
+
+@login_required(login_url='login')
+def room_messages(request, pk):
+    room = get_object_or_404(Room, id=pk)
+    if not get_role(request.user, room).is_member:
+        error = 'Not a member of this room'
+        return render(request, 'base/error_page.html', {'error': error})
+
+    since = request.GET.get('since')
+    if since is None:
+        context = {'room': room, 'room_messages': message_feed(room, request.GET.get('cursor'))}
+        return render(request, 'base/message_cards.html', context)
+
+    messages_page = new_messages(room, since)
+    if messages_page is None:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    html = render_to_string('base/message_cards.html', {
         'room': room,
-        'room_messages': room_messages,
-        'hidden_messages': hidden_messages,
-        'members': members,
-        'members_count': members_count,
-        'pending_requests': pending_requests,
-        'suspended_members': suspended_members,
-        'room_events': room_events,
-        'room_polls': room_polls
+        'room_messages': messages_page.items
+    }, request=request)
+    return JsonResponse({
+        'html': html,
+        'count': len(messages_page),
+        'has_more': messages_page.has_next,
+        'latest_cursor': latest_cursor(messages_page.items, since)
+    })
+
+
+@login_required(login_url='login')
+def room_history(request, pk):
+    room = get_object_or_404(Room, id=pk)
+    role = get_role(request.user, room)
+    if not role.is_member:
+        error = 'Not a member of this room'
+        return render(request, 'base/error_page.html', {'error': error})
+
+    history = archive.history_page(room, request.GET.get('cursor'), include_hidden=role.is_admin)
+    return render(request, 'base/history.html', {'room': room, 'history': history})
+
+
+@login_required(login_url='login')
+def export_room(request, pk):
+    """Stream the room's full history as JSON Lines; ``?compress=gzip`` gzips it."""
+    room = get_object_or_404(Room.objects.select_related('host'), id=pk)
+    if not get_role(request.user, room).is_admin:
+        error = 'Not an admin of this room'
+        return render(request, 'base/error_page.html', {'error': error})
+
+    compress = request.GET.get('compress') == 'gzip'
+    content = export.stream(room, compress)
+    if isinstance(request, ASGIRequest):
+        content = export.asynchronous(content)
+    response = StreamingHttpResponse(content, content_type='application/gzip' if compress else 'application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="room-{room.id}.jsonl{".gz" if compress else ""}"'
+    return response
+
+
+async def room_stream(request, pk):
+    """Server-sent events with changes to the room's feed; needs the ASGI server."""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would buffer the endless stream; 204 stops EventSource retrying.
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not await Room.objects.filter(id=pk).aexists():
+        raise Http404
+    role = await sync_to_async(get_role)(user, pk)
+    if not role.is_member:
+        return HttpResponseForbidden()
+
+    response = StreamingHttpResponse(streams.room_updates(int(pk)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required(login_url='login')
+def timeline(request):
+    now = timezone.now()
+    context = {
+        'events': user_timeline.live_events(request.user, now),
+        'polls': user_timeline.open_polls(request.user, now),
+        'now': now,
     }
-    return render(request, 'base/room.html', context)
+    return render(request, 'base/timeline.html', context)
 
 
 @login_required(login_url='login')
 def join_room(request, pk):
     room = get_object_or_404(Room, id=pk)
 
-    if request.user in room.members.all():
+    role = get_role(request.user, room)
+    if role.is_member:
         return redirect('home')
     else:
-        if request.user not in room.pending_requests.all() and room.open_status == False:
+        if not role.is_pending and room.open_status == False:
             room.pending_requests.add(request.user)
             return redirect('home')
 
@@ -235,7 +360,7 @@ def delete_room(request, pk):
 @login_required(login_url='login')
 def user_profile(request, pk):
     searched_user = get_object_or_404(User, id=pk)
-    rooms = searched_user.member_rooms.all()
+    rooms = searched_user.member_rooms.select_related('host')
 
     context = {'searched_user': searched_user, 'rooms': rooms}
 
@@ -243,9 +368,10 @@ def user_profile(request, pk):
 
 @login_required(login_url='login')
 def message(request, pk):
-    message = get_object_or_404(Message, id=pk)
+    message = get_object_or_404(Message.objects.select_related('author', 'room'), id=pk)
 
-    if request.user not in message.room.members.all():
+    role = get_role(request.user, message.room_id)
+    if not role.is_member:
         error = 'Not a member of this room'
         return render(request, 'base/error_page.html', {'error': error})
 
@@ -257,6 +383,8 @@ def message(request, pk):
                 comment.author = request.user
                 comment.message = message
                 comment.save()
+                message.refresh_from_db(fields=['comment_count'])
+                publish_comment(message)
                 save_notification(
                     room=message.room,
                     action_by=request.user,
@@ -265,12 +393,10 @@ def message(request, pk):
                     action_type='c'
                 )
         elif 'like_submit' in request.POST:
-            if request.user in message.likes.all():
-                message.likes.remove(request.user)
-            else:
-                message.likes.add(request.user)
-            message.save()
-            save_notification(
+            liked = message.toggle_like(request.user)
+            publish_likes(message)
+            notify = save_notification if liked else retract_notification
+            notify(
                 room=message.room,
                 action_by=request.user,
                 action_to=message.author,
@@ -278,25 +404,27 @@ def message(request, pk):
                 action_type='l'
             )
         elif 'hide_submit' in request.POST:
-            if request.user not in message.room.admins.all():
+            if not role.is_admin:
                 error = 'Not an admin. Request cannot be processed'
                 return render(request, 'base/error_page.html', {'error': error})
 
             message.hidden_status = not message.hidden_status
-            message.save()
+            message.save(update_fields=['hidden_status'])
+            publish_visibility(message)
         return redirect('room', pk=message.room.id)
     else:
         comment_form = CommentForm()
 
-    likes_count = message.likes.count()
-    comments = message.comment_set.all()
-    comments_count = comments.count()
+    likes_count = message.like_count
+    liked = message.is_liked_by(request.user)
+    comments = comment_thread(message, request.GET.get('cursor'))
 
     context = {
         'message': message,
         'likes_count': likes_count,
+        'liked': liked,
         'comments': comments,
-        'comments_count': comments_count,
+        'comments_count': message.comment_count,
         'comment_form': comment_form
     }
     return render(request, 'base/message.html', context)
@@ -305,11 +433,12 @@ def message(request, pk):
 def create_message(request, pk):
     room = get_object_or_404(Room, id=pk)
 
-    if request.user not in room.members.all():
+    role = get_role(request.user, room)
+    if not role.is_member:
         error = 'Not a member of this room'
         return render(request, "base/error_page.html", {'error': error})
 
-    if request.user in room.suspended_members.all():
+    if role.is_suspended:
         error = 'Cannot make request, Suspended'
         return render(request, "base/error_page.html", {'error': error})
 
@@ -320,6 +449,7 @@ def create_message(request, pk):
             message.room = room
             message.author = request.user
             message.save()
+            publish_new_message(message)
 
             return redirect('message', pk=message.id)
     else:
@@ -333,60 +463,75 @@ def create_message(request, pk):
 def poll(request, pk):
 
     poll = get_object_or_404(Poll, id=pk)
-    if request.user not in poll.room.members.all():
+    role = get_role(request.user, poll.room_id)
+    if not role.is_member:
         error = 'Not a member of this polls room'
         return render(request, "base/error_page.html", {'error': error})
 
-    if request.user in poll.room.suspended_members.all():
+    if role.is_suspended:
         error = 'Cannot make this request, Suspended'
         return render(request, "base/error_page.html", {'error': error})
 
     else:
         if request.method == 'POST':
             if 'vote' in request.POST:
-                if request.user in poll.voted_users.all():
+                try:
+                    selected_choice = poll.choice_set.get(id=request.POST['choice'])
+                except(KeyError, ValueError, Choice.DoesNotExist):
                     return render(
                         request,
-                        'base/error_page.html',
+                        'base/poll.html',
                         {
                             'poll': poll,
-                            'error_message': 'You already voted on this poll'
+                            'error_message': 'You did not select a choice'
                         }
                     )
-                else:
-                    try:
-                        selected_choice = poll.choice_set.get(id=request.POST['choice'])
-                    except(KeyError, Choice.DoesNotExist):
-                        return render(
-                            request,
-                            'base/poll.html',
-                            {
-                                'poll': poll,
-                                'error_message': 'You did not select a choice'
-                            }
-                        )
-                    selected_choice.votes = F('votes') + 1
-                    selected_choice.save()
-                    poll.voted_users.add(request.user)
-                    poll.save()
+                if not poll.cast_vote(request.user, selected_choice):
                     return render(
                         request,
-                        'base/poll.html',
+                        'base/error_page.html',
                         {
                             'poll': poll,
                             'error_message': 'You already voted on this poll'
                         }
                     )
+                return render(
+                    request,
+                    'base/poll.html',
+                    {
+                        'poll': poll,
+                        'error_message': 'You already voted on this poll'
+                    }
+                )
         context = {
             'poll': poll
         }
         return render(request, 'base/poll.html', context)
 
 
+async def poll_stream(request, pk):
+    """Server-sent events with the poll's tallies; needs the ASGI server."""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would buffer the endless stream; 204 stops EventSource retrying.
+        return HttpResponse(status=204)
+    user = await request.auser()
+    poll = await Poll.objects.filter(id=pk).afirst()
+    if poll is None:
+        raise Http404
+    role = await sync_to_async(get_role)(user, poll.room_id)
+    if not role.is_member or role.is_suspended:
+        return HttpResponseForbidden()
+
+    response = StreamingHttpResponse(streams.poll_tallies(poll), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required(login_url='login')
 def create_poll(request, pk):
     poll_room = get_object_or_404(Room, id=pk)
-    if request.user not in poll_room.admins.all():
+    if not get_role(request.user, poll_room).is_admin:
         error = 'Not an admin of this room'
         return render(request, "base/error_page.html", {'error': error})
 
@@ -412,7 +557,7 @@ def create_poll(request, pk):
 @login_required(login_url='login')
 def event(request, pk):
     event = get_object_or_404(Event, id=pk)
-    if request.user not in event.room.members.all():
+    if not get_role(request.user, event.room_id).is_member:
         error = 'Not a member of this room'
         return render(request, "base/error_page.html", {'error': error})
 
@@ -423,27 +568,32 @@ def event(request, pk):
                     'event': event,
                     'error_message': 'Event ended'
                 })
-            if request.user in event.accepted.all() or request.user in event.rejected.all():
+            if 'accepted' in request.POST:
+                status = 'a'
+            elif 'rejected' in request.POST:
+                status = 'r'
+            else:
+                return redirect('event', pk=event.id)
+            if not event.respond(request.user, status):
                 return render(request, 'base/event.html', {
                     'event': event,
+                    'rsvp_status': event.rsvp_status(request.user),
                     'error_message': 'You already accepted or rejected this event'
                 })
-            else:
-                if 'accepted' in request.POST:
-                    event.accepted.add(request.user)
-                elif 'rejected' in request.POST:
-                    event.rejected.add(request.user)
-                return redirect('event', pk=event.id)
+            return redirect('event', pk=event.id)
 
         else:
-            context = {'event': event}
+            context = {
+                'event': event,
+                'rsvp_status': event.rsvp_status(request.user)
+            }
             return render(request, 'base/event.html', context)
 
 
 @login_required(login_url='login')
 def create_event(request, pk):
     event_room = get_object_or_404(Room, id=pk)
-    if request.user not in event_room.admins.all():
+    if not get_role(request.user, event_room).is_admin:
         error = 'Not an admin of this room'
         return render(request, "base/error_page.html", {'error': error})
 
@@ -491,4 +641,16 @@ def create_choice(request, pk):
         return render(request, 'base/choice_form.html', {
             'choice_form': choice_form
         }
-                      )
\ No newline at end of file
+                      )
+
+
+def metrics(request):
+    """Request metrics of this process in the Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'base.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,7 +56,7 @@ ROOT_URLCONF = 'ideal_train.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'base.metrics.Templates',
         'DIRS': [
             BASE_DIR / 'templates',
         ],
@@ -65,6 +67,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'base.context_processors.inbox',
+                'base.context_processors.live_updates',
             ],
         },
     },
@@ -83,6 +87,40 @@ DATABASES = {
     }
 }
 
+# DATABASE_PROFILE=production tunes SQLite for several worker processes:
+# WAL lets readers run alongside the writer, the busy timeout makes writers
+# queue instead of failing with "database is locked", and connections are
+# kept open between requests. Transactions begin IMMEDIATE so they take the
+# write lock up front; a DEFERRED transaction that reads and then writes
+# fails at once with SQLITE_BUSY, without waiting for the busy timeout.
+# The PRAGMAs are applied to every new connection by base.sqlite.apply_pragmas.
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+
+SQLITE_PROFILES = {
+    'development': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+SQLITE_PRAGMAS = SQLITE_PROFILES[DATABASE_PROFILE]
+SQLITE_OPTIONS = {
+    'development': {},
+    'production': {'transaction_mode': 'IMMEDIATE'},
+}
+DATABASES['default']['OPTIONS'] = SQLITE_OPTIONS[DATABASE_PROFILE]
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -123,7 +161,91 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 
+# Caches
+# 'fragments' holds rendered cards; keys carry the object's version, so
+# stale entries are simply never read again and age out.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Anonymous page cache (base.page_cache)
+# Entries live in the default cache. With LocMemCache, invalidation only
+# reaches the process that saved the room, so PAGE_CACHE_TIMEOUT bounds
+# how stale other workers can be; a shared cache removes that limit.
+
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_STALE_TIMEOUT = 60 * 60
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_LOCK_WAIT = 2.0
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Notifications
+# 'outbox' only records an event that `manage.py dispatch_notifications` turns
+# into notifications, so run that worker alongside the app. 'inline' writes
+# them inside the request; tests that check notification rows use it.
+
+NOTIFICATION_DISPATCH = os.environ.get('NOTIFICATION_DISPATCH', 'outbox')
+NOTIFICATION_OUTBOX_BATCH_SIZE = 500
+NOTIFICATION_OUTBOX_FLUSH_INTERVAL = 1.0
+
+
+# Room roles
+# Roles are cached per process and dropped when memberships change; the TTL
+# bounds how long another process's changes can go unnoticed.
+
+ROOM_ROLE_CACHE_TTL = 60
+ROOM_ROLE_CACHE_SIZE = 100000
+
+
+# Live updates
+# Streams are served through ideal_train/asgi.py. LocalBroker only reaches
+# clients connected to the same process.
+
+PUBSUB_BROKER = 'base.pubsub.LocalBroker'
+PUBSUB_QUEUE_SIZE = 1000
+POLL_STREAM_INTERVAL = 0.5
+ROOM_STREAM_INTERVAL = 0.25
+STREAM_KEEPALIVE = 15.0
+# Milliseconds browsers wait before reconnecting a dropped stream.
+STREAM_RETRY = 3000
+
+
+# Metrics
+# /metrics serves this process's request metrics in Prometheus format.
+# Scrapers send "Authorization: Bearer $METRICS_TOKEN"; without a token only
+# METRICS_ALLOWED_IPS may read it.
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# Archive
+# `manage.py archive_messages` moves messages older than their room's
+# retention_days, or MESSAGE_RETENTION_DAYS, into ArchivedMessage.
+
+MESSAGE_RETENTION_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_COMPRESSION_LEVEL = 6
+
+
+# Export
+# Room exports read EXPORT_BATCH_SIZE rows per query and send roughly
+# EXPORT_CHUNK_SIZE bytes per write.
+
+EXPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 64 * 1024
@@ -0,0 +1,11 @@
+// Replace every "Load more" link with the next page of cards it points at.
+document.addEventListener('click', function (event) {
+    const link = event.target.closest('a.load-more');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    fetch(link.href, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+        .then(function (response) { return response.text(); })
+        .then(function (html) { link.outerHTML = html; });
+});
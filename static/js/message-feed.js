@@ -0,0 +1,136 @@
+// Infinite scroll and live updates for the room message feed. Updates are
+// pushed over server-sent events; without them the feed polls "new since".
+(function () {
+    const feed = document.getElementById('message-feed');
+    if (!feed) {
+        return;
+    }
+    const POLL_INTERVAL = 5000;
+    let latestCursor = feed.dataset.latestCursor;
+
+    // Follow the "Load older messages" link as soon as it scrolls into view.
+    const observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                entry.target.click();
+            }
+        });
+    });
+    function watchLoadMore() {
+        feed.querySelectorAll('a.load-more').forEach(function (link) {
+            observer.observe(link);
+        });
+    }
+    new MutationObserver(watchLoadMore).observe(feed, {childList: true});
+    watchLoadMore();
+
+    function insertNewest(html) {
+        const template = document.createElement('template');
+        template.innerHTML = html;
+        const heading = feed.querySelector('h2');
+        // Responses are oldest first, so each card goes right below the heading.
+        template.content.querySelectorAll('a.card-wrapper').forEach(function (card) {
+            if (!feed.querySelector('[data-message-id="' + card.dataset.messageId + '"]')) {
+                heading.after(card);
+            }
+        });
+    }
+
+    function catchUp(repeat) {
+        const url = feed.dataset.feedUrl + '?since=' + encodeURIComponent(latestCursor);
+        fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (data.count) {
+                    insertNewest(data.html);
+                }
+                latestCursor = data.latest_cursor;
+                if (data.has_more) {
+                    catchUp(repeat);
+                } else if (repeat) {
+                    setTimeout(catchUp, POLL_INTERVAL, repeat);
+                }
+            })
+            .catch(function () {
+                if (repeat) {
+                    setTimeout(catchUp, POLL_INTERVAL, repeat);
+                }
+            });
+    }
+
+    function card(id) {
+        return feed.querySelector('[data-message-id="' + id + '"]');
+    }
+
+    // Cards are newest first; place an unhidden card by id among them.
+    function insertById(html) {
+        const template = document.createElement('template');
+        template.innerHTML = html.trim();
+        const newCard = template.content.firstChild;
+        const id = Number(newCard.dataset.messageId);
+        if (card(id)) {
+            return;
+        }
+        const older = Array.from(feed.querySelectorAll('a.card-wrapper')).find(function (other) {
+            return Number(other.dataset.messageId) < id;
+        });
+        if (older) {
+            older.before(newCard);
+        } else if (!feed.querySelector('a.load-more')) {
+            feed.querySelector('h2').after(newCard);
+        }
+    }
+
+    function listen() {
+        const source = new EventSource(feed.dataset.streamUrl);
+        let connected = false;
+        source.addEventListener('open', function () {
+            // Pick up whatever was posted while disconnected.
+            if (connected) {
+                catchUp(false);
+            }
+            connected = true;
+        });
+        source.addEventListener('message', function (event) {
+            insertNewest(JSON.parse(event.data).html);
+        });
+        source.addEventListener('unhidden', function (event) {
+            insertById(JSON.parse(event.data).html);
+        });
+        source.addEventListener('hidden', function (event) {
+            const hidden = card(JSON.parse(event.data).id);
+            if (hidden) {
+                hidden.remove();
+            }
+        });
+        source.addEventListener('likes', function (event) {
+            const data = JSON.parse(event.data);
+            const liked = card(data.id);
+            if (liked) {
+                liked.querySelector('.like-count').textContent = data.count + ' like' + (data.count === 1 ? '' : 's');
+            }
+        });
+        source.addEventListener('comment', function (event) {
+            const data = JSON.parse(event.data);
+            const commented = card(data.id);
+            if (commented) {
+                commented.querySelector('.comment-count').textContent = data.count + ' comment' + (data.count === 1 ? '' : 's');
+            }
+            if (commented && !commented.querySelector('.activity')) {
+                const note = document.createElement('p');
+                note.className = 'activity';
+                note.textContent = 'New comments';
+                commented.querySelector('.card').append(note);
+            }
+        });
+        source.addEventListener('reset', function () {
+            catchUp(false);
+        });
+    }
+
+    if (window.EventSource && feed.dataset.streamUrl) {
+        listen();
+    } else {
+        setTimeout(catchUp, POLL_INTERVAL, true);
+    }
+})();
@@ -0,0 +1,24 @@
+// Live poll tallies pushed by the server instead of reloading the page.
+(function () {
+    const tally = document.getElementById('poll-tally');
+    if (!tally || !tally.dataset.streamUrl || !window.EventSource) {
+        return;
+    }
+    const source = new EventSource(tally.dataset.streamUrl);
+
+    function update(event) {
+        const data = JSON.parse(event.data);
+        Object.keys(data.choices).forEach(function (choiceId) {
+            const count = tally.querySelector('[data-choice-id="' + choiceId + '"]');
+            if (count) {
+                count.textContent = data.choices[choiceId];
+            }
+        });
+    }
+
+    source.addEventListener('tally', update);
+    source.addEventListener('closed', function (event) {
+        update(event);
+        source.close();
+    });
+})();